@@ -21,11 +21,28 @@ from glux.texture import *
 from glux.shape import *
 from glux.geometry import *
 from glux.light import *
+from glux.shadow import *
+from glux.spatial import *
+from glux.rendertarget import *
+from glux.batch import *
+from glux.primitives import *
+from glux.atlas import *
+from glux.glyphs import *
+from glux.loader import *
+from glux.diskcache import *
+from glux.camera import *
+from glux.lightmap import *
+from glux.shaderlight import *
+from glux.softlight import *
+import glux.profiler
+import glux.resources
+import glux.streaming
 import glux.tools
 
 class Window():
 
-    def start(self,width,height,caption,fullscreen = False,environment_color=False):
+    def start(self,width,height,caption,fullscreen = False,environment_color=False,render_target_budget=256*1024*1024,
+              light_map_budget=None):
 
         self.fullscreen = fullscreen;
         self.width = width;
@@ -35,8 +52,18 @@ class Window():
 
         #Render mode mode
         self.render_to = 'window';
-        self.render_texture = Texture(None,width=self.width,height=self.height);
-        self.framebuffer = None;
+        self.render_texture = None;
+        self.render_targets = RenderTargetPool(render_target_budget);
+
+        #Sprite and primitive batching, off until begin_batch
+        self.batch = None;
+        self.primitive_batch = None;
+
+        #Without a camera, world and window coordinates are the same
+        self.camera = None;
+
+        #Without a lighting engine, every light gets its own texture
+        self.lighting_engine = None;
 
         #Environment color
         if not environment_color:
@@ -45,9 +72,15 @@ class Window():
             self.env_color = glux.tools.translate_color(*environment_color);
 
         #Prepare lighting
-        self.light = {};
+        self.light = LightMapStore(self.render_targets,light_map_budget);
+        self.lighting_state = {}; #Per key, what build_lighting blended into it last time
+        self.partial_lighting = True;
         self.inside = False;
         self.shadowcasters = [];
+        self.shadowbatch = None;
+        self.shadowcaster_grid = None;
+        self.shadowcaster_cell_size = 128;
+        self.white_shadowcaster_tile_size = 256;
         self.white_shadowcasters = None;
 
     def _create_window(self):
@@ -58,18 +91,8 @@ class Window():
         else:
             p.display.set_mode((self.width,self.height),p.OPENGL|p.DOUBLEBUF|p.FULLSCREEN);
 
-        #Load the window
-        glViewport(0, 0, self.width, self.height);
-
-        #Set the 2D mode
-        glMatrixMode(GL_PROJECTION);
-        glLoadIdentity();
-
-        gluOrtho2D(0,self.width,0,self.height);
-
-        #?
-        glMatrixMode(GL_MODELVIEW);
-        glLoadIdentity();
+        #Load the window, in 2D mode
+        self._set_view(0,0,self.width,self.height);
 
         #Turn on smooth shading
         glShadeModel(GL_SMOOTH);
@@ -90,21 +113,119 @@ class Window():
         #Caption
         p.display.set_caption(self.caption)
 
+    def _set_view(self,x,y,width,height):
+        """Shows the width x height part of the window at pygame coordinate (x,y) on the current target""";
+
+        self.view = (x,y,width,height);
+        glViewport(0, 0, width, height);
+
+        #Set the 2D mode
+        glMatrixMode(GL_PROJECTION);
+        glLoadIdentity();
+
+        bottom = self.height - y - height;
+        gluOrtho2D(x,x+width,bottom,bottom+height);
+
+        #?
+        glMatrixMode(GL_MODELVIEW);
+        glLoadIdentity();
+
     def close(self):
+        """Returns what glux made that was still alive, per kind of OpenGL object (see ResourceManager.get_report)""";
+
+        #Give back what glux itself keeps, so only what's left counts as leaked
+        self.light.clear();
+        self.render_targets.clear();
+        glux.shape.clear_disk_buffers();
+        glux.glyphs.clear_glyph_atlases();
+        glux.streaming.clear_stream_buffer();
+
+        leaks = glux.resources.manager.shutdown();
         p.display.quit();
 
+        return leaks;
+
     def update(self):
+        self.flush_batch();
         p.display.flip();
 
+        #What was released during the frame can safely be deleted now
+        self.render_targets.end_frame();
+        glux.resources.manager.collect();
+
+        self.light.end_frame();
+
+        if self.camera != None:
+            self.camera.end_frame();
+
+        if glux.profiler.active != None:
+            glux.profiler.active.end_frame();
+
+    def start_profiling(self,frames=120):
+        """Records timings and OpenGL call counts of the last frames, until stop_profiling""";
+
+        profiler = glux.profiler.FrameProfiler(frames);
+        profiler.start();
+
+        return profiler;
+
+    def stop_profiling(self):
+
+        if glux.profiler.active != None:
+            glux.profiler.active.stop();
+
+    def set_camera(self,camera):
+        """From now on, positions given to draw are world coordinates; None goes back to window coordinates""";
+
+        self.camera = camera;
+
+    def begin_batch(self,ordered=True):
+        """From now on, Window.draw collects sprites and draws them per texture in one go""";
+
+        self.flush_batch();
+        self.batch = SpriteBatch(ordered);
+        self.primitive_batch = PrimitiveBatch();
+
+    def end_batch(self):
+
+        self.flush_batch();
+        self.batch = None;
+        self.primitive_batch = None;
+
+    def flush_batch(self):
+
+        if self.batch != None:
+            self.batch.flush();
+            self.primitive_batch.flush();
+
     def draw_empty_background(self):
         self.fill((0,0,0,0));
 
     def fill(self,color):
+        self.flush_batch();
         glClearColor(*color);
         glClear(GL_COLOR_BUFFER_BIT|GL_DEPTH_BUFFER_BIT)
         glLoadIdentity()        
         
-    def draw(self,source,dest1, dest2=None,rotation=None): 
+    def draw(self,source,dest1, dest2=None,rotation=None,screen=False): 
+        """With screen True, the positions are window coordinates even when there is a camera""";
+
+        #Assets that are still loading show their placeholder, if they have one
+        if isinstance(source,AssetHandle):
+            source = source.get();
+
+            if source == None:
+                return;
+
+        world = not screen;
+
+        #Don't bother with things outside the window
+        if world and self.camera != None and dest2 == None and is_texturelike(source):
+            if self._is_outside_view(source,self.camera.world_to_screen(dest1),rotation):
+                self.camera.culled += 1;
+                return;
+
+            self.camera.drawn += 1;
 
         #pygame to opengl coordinates
         if isinstance(source,Layer):
@@ -114,17 +235,105 @@ class Window():
         else:
             extra = 0;
 
-        dest1 = self.translate_coords(dest1,extra);
+        dest1 = self.translate_coords(dest1,extra,world);
+
+        #Collect it if we are batching, or draw what was collected first to keep the order
+        if self.batch != None:
+            if dest2 == None and self.batch.can_draw(source):
+                self.primitive_batch.flush();
+                self.batch.add(source,dest1,rotation);
+                return;
+
+            if dest2 != None and isinstance(source,Line):
+                self.batch.flush();
+                dest2 = self.translate_coords(dest2,extra,world);
+                self.primitive_batch.add_line(dest1,dest2,source.size,source.color);
+                return;
+
+            self.flush_batch();
 
         #Draw
         if dest2 == None:
             source.draw(dest1,rotation);
         else:
-            dest2 = self.translate_coords(dest2,extra);            
+            dest2 = self.translate_coords(dest2,extra,world);
             source.draw(dest1,dest2);
 
+    def draw_polyline(self,points,width,color,closed=False):
+
+        points = [self.translate_coords(point,0,True) for point in points];
+        primitives = self._get_primitive_batch();
+        primitives.add_polyline(points,width,glux.tools.translate_color(*color),closed);
+
+        if self.batch == None:
+            primitives.flush();
+
+    def draw_rect(self,rect,color,width=None):
+        """Rect is (x,y,width,height); without a line width, the rectangle is filled""";
+
+        x, y, rect_width, rect_height = rect;
+        corners = [(x,y),(x+rect_width,y),(x+rect_width,y+rect_height),(x,y+rect_height)];
+        corners = [self.translate_coords(corner,0,True) for corner in corners];
+
+        primitives = self._get_primitive_batch();
+        primitives.add_rect(corners,glux.tools.translate_color(*color),width);
+
+        if self.batch == None:
+            primitives.flush();
+
+    def draw_polygon(self,points,color):
+        """Filled; the polygon should be convex""";
+
+        points = [self.translate_coords(point,0,True) for point in points];
+        primitives = self._get_primitive_batch();
+        primitives.add_polygon(points,glux.tools.translate_color(*color));
+
+        if self.batch == None:
+            primitives.flush();
+
+    def _get_primitive_batch(self):
+
+        #Outside of batching, primitives get a batch of their own that is drawn right away
+        if self.batch == None:
+            return PrimitiveBatch();
+
+        self.batch.flush();
+
+        return self.primitive_batch;
+
+    def draw_many(self,source,positions):
+        """Draws source at all positions with one draw call; source needs a draw_many, like Disk""";
+
+        self.flush_batch();
+        source.draw_many([self.translate_coords(pos,0,True) for pos in positions]);
+
+    def _is_outside_view(self,source,pos,rotation=None):
+
+        width = source.width;
+        height = source.height;
+
+        if isinstance(source,Textblock):
+            height *= len(source.images);
+
+        left, top = pos;
+        right = left + width;
+        bottom = top + height;
+
+        #Rotating can move the corners anywhere within reach of the rotation center
+        if rotation != None:
+            centerx = left + source.rotation_center[0];
+            centery = bottom - source.rotation_center[1];
+            reach = max(abs(centerx - left),abs(centerx - right)) + max(abs(centery - top),abs(centery - bottom));
+            left, top, right, bottom = centerx - reach, centery - reach, centerx + reach, centery + reach;
+
+        view_x, view_y, view_width, view_height = self.view;
+
+        return right < view_x or left > view_x + view_width or bottom < view_y or top > view_y + view_height;
+
     def draw_shadow(self, light, light_location, source, dest):
 
+        self.flush_batch();
+
         #pygame to opengl coordinates
         if is_texturelike(source):
             extra = source.height;
@@ -142,21 +351,69 @@ class Window():
         topright = distance_to_coord_via_point(light_location,length,basepoint2);        
 
         #Translate to OpenGL coords
-        dest = self.translate_coords(dest,extra);
-        basepoint1 = self.translate_coords(basepoint1);
-        basepoint2 = self.translate_coords(basepoint2);
-        topleft = self.translate_coords(topleft);
-        topright = self.translate_coords(topright);
+        dest = self.translate_coords(dest,extra,True);
+        basepoint1 = self.translate_coords(basepoint1,0,True);
+        basepoint2 = self.translate_coords(basepoint2,0,True);
+        topleft = self.translate_coords(topleft,0,True);
+        topright = self.translate_coords(topright,0,True);
 
         #Draw the shadow
         source.draw_shadow(basepoint1,basepoint2,topleft,topright,dest,self.inside);
 
-    def translate_coords(self,coords,extra = 0):
+    def find_shadowcasters(self, light_location, distance):
+        """Indices of the shadowcasters whose center is within distance plus their longest side""";
+
+        if self.shadowbatch == None:
+            return [];
+
+        #Ask the grid for the neighbourhood first, then do the exact check on those only
+        reach = distance + self.shadowbatch.get_max_longest_side();
+        candidates = self.shadowcaster_grid.query_radius(light_location,reach);
+
+        return self.shadowbatch.select(light_location,distance,candidates);
+
+    def draw_shadows(self, light, light_location, indices=None):
+
+        if self.shadowbatch == None:
+            return;
+
+        self.flush_batch();
+
+        if indices is None:
+            indices = self.find_shadowcasters(light_location,light.visibility_distance);
+
+        #All shadows of the nearby casters in one go
+        self.shadowbatch.draw(self,light_location,indices);
+
+    def translate_coords(self,coords,extra = 0,world = False):
+
+        #World to window coordinates first, if asked
+        if world:
+            coords = self.world_to_screen(coords);
 
         y = self.height - coords[1] - extra;
         return (coords[0],y);
+
+    def world_to_screen(self,coords):
+
+        if self.camera == None:
+            return coords;
+
+        return self.camera.world_to_screen(coords);
+
+    def get_camera_offset(self):
+
+        if self.camera == None:
+            return (0,0);
+
+        return (self.camera.x,self.camera.y);
         
-    def change_rendermode(self,new_mode,use_texture=None, width=None, height=None):
+    def change_rendermode(self,new_mode,use_texture=None, width=None, height=None, offset=None):
+        """Offset is the pygame coordinate of the window that ends up in the corner of the texture""";
+
+        if use_texture != None:
+            width = use_texture.width;
+            height = use_texture.height;
 
         if width == None:
             width = self.width;
@@ -164,50 +421,26 @@ class Window():
         if height == None:
             height = self.height;
 
+        if offset == None:
+            offset = (0,0);
+
         if new_mode == self.render_to:
             return;
 
-        if new_mode == 'texture':            
+        self.flush_batch();
 
-            #Explicit garbage colleciton
-            if self.framebuffer != None:
-                glDeleteFramebuffersEXT(self.framebuffer);
+        if new_mode == 'texture':
 
-            del self.render_texture;
-
-            #Create the framebuffer (the target)
-            self.framebuffer = glGenFramebuffersEXT(1);
-            glBindFramebufferEXT(GL_FRAMEBUFFER_EXT, self.framebuffer);
-
-            #Create a new render_texture to render to
+            #Get a texture with a framebuffer from the pool, unless we were given one
             if use_texture == None:
-                success = False;
-
-                while success == False:
-                    try:
-                        self.render_texture = Texture(None,width=width,height=height);
-                        success = True;
-                    except:
-                        print('%%FAILEDD')
-                        pass;
-
+                self.render_texture = self.render_targets.acquire(width,height);
             else:
                 self.render_texture = use_texture;
-            self.render_texture.bind();
-
-            #Link it to the buffer (try again if memory problem)
-            while True:
-                try:
-                    glFramebufferTexture2DEXT(GL_FRAMEBUFFER_EXT, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, self.render_texture.tex, 0);
-                    break;
-                except:
-                    print('Warning: texture creation error')
-                    pass;
-            
-            self.render_texture.unbind();
-    
-            #Setup the drawbuffer (?)
-            #drawbuffer = glDrawBuffers(1,GL_COLOR_ATTACHMENT0);               
+
+            glBindFramebufferEXT(GL_FRAMEBUFFER_EXT, self.render_targets.get_framebuffer(self.render_texture));
+
+            #Only draw the part of the window the texture covers
+            self._set_view(offset[0],offset[1],width,height);
 
             self.render_to = 'texture';
 
@@ -215,6 +448,7 @@ class Window():
 
             #Assuming you was in texture mode before, unbind the framebuffer
             glBindFramebufferEXT(GL_FRAMEBUFFER_EXT, 0);
+            self._set_view(0,0,self.width,self.height);
 
             #Make a new displaylist for the newly generated texture
             self.render_texture.texture_to_displaylist();
@@ -226,6 +460,8 @@ class Window():
         if new_mode == self.render_to:
             return;
 
+        self.flush_batch();
+
         if new_mode == 'alpha':
             glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
 
@@ -235,7 +471,8 @@ class Window():
         elif new_mode == 'screen':
             glBlendFunc(GL_ONE, GL_ONE_MINUS_SRC_COLOR)            
             
-    def build_lighting(self,lights,glowers,width=None,height=None, key='main'):
+    def build_lighting(self,lights,glowers,width=None,height=None, key='main', lifetime=None):
+        """With a lifetime, the lighting is released when it hasn't been built or drawn for that many frames""";
 
         if width == None:
             width = self.width;
@@ -243,6 +480,37 @@ class Window():
         if height == None:
             height = self.height;
 
+        if self.lighting_engine != None:
+            self.lighting_engine.build(self,lights,width,height);
+            self.lighting_state.pop(key,None);
+
+        else:
+            state = [(l,l.version,l.area) for l in lights];
+            previous = self.lighting_state.get(key);
+            dirty = None;
+
+            #Only the parts where lights changed have to be blended again
+            if self.partial_lighting and key in self.light and previous != None and \
+               previous['size'] == (width,height) and previous['env_color'] == self.env_color:
+                dirty = self._get_dirty_rects(previous['lights'],state);
+
+            if dirty == None:
+                self._blend_lights(lights,width,height);
+            elif dirty != []:
+                self._blend_lights_in(lights,dirty,key,height);
+
+            self.lighting_state[key] = {'size': (width,height),'env_color': self.env_color,'lights': state};
+
+            #The texture was updated in place
+            if dirty != None:
+                self.light.set(key,self.light[key],lifetime);
+                return;
+
+        #The previous lighting of this key goes back to the pool, to be reused for something else
+        self.light.set(key,self.render_texture,lifetime);
+
+    def _blend_lights(self,lights,width,height):
+
         #Blend the renders of all lights together
         self.change_rendermode('texture',width=width,height=height);
 
@@ -256,39 +524,153 @@ class Window():
         self.change_blendmode('alpha');
         self.change_rendermode('window');
 
-        self.light[key] = self.render_texture;
+    def _blend_lights_in(self,lights,rects,key,height):
+        """Blends the lights again, but only within rects; the rest of the lighting texture is kept""";
+
+        self.change_rendermode('texture',self.light[key]);
+        self.change_blendmode('screen');
+        glEnable(GL_SCISSOR_TEST);
+
+        for rect in rects:
+
+            #Scissor boxes are in OpenGL coordinates of the texture
+            glScissor(rect.x,height-rect.bottom,rect.width,rect.height);
+            self.fill(self.env_color);
+
+            for l in lights:
+                if rect.colliderect(l.area):
+                    l.draw((0,0));
+
+            self.flush_batch();
+
+        glDisable(GL_SCISSOR_TEST);
+        self.change_blendmode('alpha');
+        self.change_rendermode('window');
+
+    def _get_dirty_rects(self,previous,current):
+        """The areas where the lighting changed, as non-overlapping rects; None if it all has to be blended again""";
+
+        old = {id(l): (version,area) for l,version,area in previous};
+        new = {id(l): (version,area) for l,version,area in current};
+
+        #Screen blending rounds after every light, so a different order gives slightly different colors
+        if [i for i in old if i in new] != [i for i in new if i in old]:
+            return None;
+
+        rects = [];
+
+        for i in new:
+            if i not in old:
+                rects.append(new[i][1]);
+            elif old[i] != new[i]:
+                rects += [old[i][1],new[i][1]];
+
+        for i in old:
+            if i not in new:
+                rects.append(old[i][1]);
+
+        #Overlapping rects are merged, so no light is blended twice
+        merged = [];
+
+        for rect in rects:
+            rect = p.Rect(rect);
+            i = rect.collidelist(merged);
+
+            while i != -1:
+                rect = rect.union(merged.pop(i));
+                i = rect.collidelist(merged);
+
+            merged.append(rect);
+
+        return merged;
 
     def draw_lighting(self, pos = None, key = 'main'):
 
         if pos == None:
             pos = (0,0);
 
-        if self.light != {}:
+        if key in self.light:
 
             #Draw light and shadows on top of the world
             self.change_blendmode('multiply');
-            self.draw(self.light[key],pos);
+            self.draw(self.light[key],pos,screen=True);
             self.change_blendmode('alpha');
 
         else:
             raise LightNotRenderedError;
 
     def set_shadowcasters(self,shadowcasters):
+        """Replaces all shadowcasters; they get the indices 0, 1, 2, ... in the order given""";
+
+        self.shadowcasters = list(shadowcasters);
+        self.shadowbatch = ShadowBatch(self.shadowcasters);
 
-        self.shadowcasters = shadowcasters;
+        self.shadowcaster_grid = SpatialGrid(self.shadowcaster_cell_size);
+
+        for index in range(len(self.shadowcasters)):
+            self.shadowcaster_grid.insert(index,self.shadowbatch.get_rect(index));
+
+        self._build_white_shadowcasters();
+
+    def add_shadowcaster(self,caster,casterpos):
+        """Adds one shadowcaster and returns its index""";
+
+        if self.shadowbatch == None:
+            self.set_shadowcasters([]);
+
+        index = self.shadowbatch.append(caster,casterpos);
+        self.shadowcaster_grid.insert(index,self.shadowbatch.get_rect(index));
+        self.shadowcasters.append((caster,casterpos));
+
+        #Only the tile it lands in is rebuilt
+        self.white_shadowcasters.append(caster.give_white_variant(),casterpos);
+        self.white_shadowcasters.freeze();
+
+        return index;
+
+    def remove_shadowcaster(self,index):
+
+        caster = self.shadowbatch.casters[index];
+        casterpos = self.shadowbatch.positions[index];
+
+        self.shadowbatch.remove(index);
+        self.shadowcaster_grid.remove(index);
+        self.shadowcasters.remove((caster,casterpos));
+
+        self.white_shadowcasters.remove(caster.give_white_variant(),casterpos);
+        self.white_shadowcasters.freeze();
+
+    def move_shadowcaster(self,index,casterpos):
+
+        caster = self.shadowbatch.casters[index];
+        old_casterpos = self.shadowbatch.positions[index];
+
+        self.shadowbatch.move(index,casterpos);
+        self.shadowcaster_grid.move(index,casterpos);
+        self.shadowcasters[self.shadowcasters.index((caster,old_casterpos))] = (caster,casterpos);
+
+        self.white_shadowcasters.move(caster.give_white_variant(),old_casterpos,casterpos);
+        self.white_shadowcasters.freeze();
+
+    def _build_white_shadowcasters(self):
 
         #Create or recreate a layer for them
-        self.white_shadowcasters = Layer(self);
+        self.white_shadowcasters = Layer(self,self.white_shadowcaster_tile_size);
 
         for caster,casterpos in self.shadowcasters:
             self.white_shadowcasters.append(caster.give_white_variant(),casterpos);
 
-        self.white_shadowcasters.freeze();        
+        self.white_shadowcasters.freeze();
 
     def draw_white_shadowcasters(self):
 
         self.draw(self.white_shadowcasters,(0,0));
 
+    def set_lighting_engine(self,engine):
+        """Engine is for example a ShaderLighting; None goes back to a texture per light""";
+
+        self.lighting_engine = engine;
+
     def set_env_color(self,color):
 
         self.env_color = glux.tools.translate_color(*color);
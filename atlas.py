@@ -0,0 +1,255 @@
+import pygame as p
+from OpenGL.GL import *
+
+import glux.texture
+import glux.resources
+
+class TextureAtlas():
+    """Packs many small images into a few big textures, so drawing them needs fewer texture binds.
+
+    Add images with add or add_text; you get an AtlasRegion back right away, which can be drawn
+    (and put in a Layer) like any Texture once build or update has been called.""";
+
+    def __init__(self,page_size=1024,padding=1):
+
+        self.page_size = page_size;
+        self.padding = padding;
+
+        self.regions = [];
+        self.pages = [];
+        self.built = False;
+
+        self._packing = []; #The _Page of every page, with its free space
+
+    def add(self,source,colorkey=None,transparent=True,base=None,square_shadow=False):
+        """Source is a filename or a pygame Surface""";
+
+        if isinstance(source,str):
+            if transparent:
+                surface = p.image.load(source).convert_alpha();
+            else:
+                surface = p.image.load(source).convert();
+        else:
+            surface = source;
+
+        if colorkey != None:
+            surface.set_colorkey(colorkey);
+
+        region = AtlasRegion(self,surface,base,square_shadow);
+        self.regions.append(region);
+        self.built = False;
+
+        return region;
+
+    def add_text(self,text,font,color):
+
+        return self.add(font.render(text,True,color));
+
+    def build(self):
+        """Packs all images and uploads the pages; call again after adding more. Images that were built
+        before can move, so their uv changes""";
+
+        pages = self._pack(self.regions,[]);
+
+        #The old pages are replaced
+        for page in self.pages:
+            page.delete();
+
+        self.pages = [];
+        self._packing = pages;
+
+        for page in pages:
+            self.pages.append(page.upload());
+
+        self.built = True;
+
+    def update(self):
+        """Packs only the images added since the last build, into the free space of the pages (or new
+        ones), so the images that were built before keep their place and uv""";
+
+        new = [region for region in self.regions if region.page == None];
+        old_pages = list(self._packing);
+        new_pages = self._pack(new,old_pages)[len(old_pages):];
+
+        for page in old_pages:
+            page.upload_new();
+
+        for page in new_pages:
+            self._packing.append(page);
+            self.pages.append(page.upload());
+
+        self.built = True;
+
+    def _pack(self,regions,pages):
+        """Places the regions on the pages, adding pages where needed; returns all pages""";
+
+        pages = list(pages);
+
+        #Tallest images first, so the shelves are filled well
+        order = sorted(regions,key=lambda r: (r.height,r.width),reverse=True);
+
+        for region in order:
+            width = region.width + self.padding;
+            height = region.height + self.padding;
+
+            placed = False;
+
+            for page in pages:
+                placed = page.place(region,width,height);
+
+                if placed:
+                    break;
+
+            if not placed:
+                page = _Page(max(self.page_size,width),max(self.page_size,height));
+                page.place(region,width,height);
+                pages.append(page);
+
+        return pages;
+
+    def efficiency(self):
+        """How much of the page area is covered by images, from 0 to 1""";
+
+        total = 0;
+
+        for page in self.pages:
+            total += page.width * page.height;
+
+        if total == 0:
+            return 0;
+
+        used = 0;
+
+        for region in self.regions:
+            used += region.width * region.height;
+
+        return used / total;
+
+class _Page():
+
+    def __init__(self,width,height):
+
+        self.width = width;
+        self.height = height;
+
+        self.shelves = []; #[y, height, x of the free space]
+        self.regions = [];
+        self.texture = None;
+
+    def place(self,region,width,height):
+
+        for shelf in self.shelves:
+            if height <= shelf[1] and shelf[2] + width <= self.width:
+                self._put(region,shelf[2],shelf[0]);
+                shelf[2] += width;
+                return True;
+
+        #Start a new shelf under the last one
+        if len(self.shelves) == 0:
+            y = 0;
+        else:
+            y = self.shelves[-1][0] + self.shelves[-1][1];
+
+        if y + height > self.height or width > self.width:
+            return False;
+
+        self.shelves.append([y,height,width]);
+        self._put(region,0,y);
+
+        return True;
+
+    def _put(self,region,x,y):
+
+        region.atlas_pos = (x,y);
+        self.regions.append(region);
+
+    def upload(self):
+
+        #Copy the pixels row by row (blitting would blend the alpha of the images)
+        pixels = bytearray(self.width * self.height * 4);
+        page_row = self.width * 4;
+
+        for region in self.regions:
+            x, y = region.atlas_pos;
+            data = p.image.tostring(region.surface,'RGBA',1);
+            region_row = region.width * 4;
+
+            #Flipped, like texture data: the first row is the bottom one
+            bottom = self.height - y - region.height;
+
+            for row in range(region.height):
+                start = (bottom + row) * page_row + x * 4;
+                pixels[start:start+region_row] = data[row*region_row:(row+1)*region_row];
+
+        self.texture = glux.texture.Texture(bytes(pixels),width=self.width,height=self.height);
+
+        for region in self.regions:
+            self._set_region(region);
+
+        return self.texture;
+
+    def upload_new(self):
+        """Copies the regions placed since the upload into the texture, leaving the others alone""";
+
+        self.texture.bind();
+
+        for region in self.regions:
+            if region.page != None:
+                continue;
+
+            x, y = region.atlas_pos;
+            data = p.image.tostring(region.surface,'RGBA',1);
+            glTexSubImage2D(GL_TEXTURE_2D,0,x,self.height - y - region.height,region.width,region.height,
+                            GL_RGBA,GL_UNSIGNED_BYTE,data);
+
+            self._set_region(region);
+
+    def _set_region(self,region):
+
+        #The data is flipped when uploading, so OpenGL's bottom is the surface's bottom
+        x, y = region.atlas_pos;
+        region.page = self.texture;
+        region.tex = self.texture.tex;
+        region.uv = (x / self.width,(self.height - y - region.height) / self.height,
+                     (x + region.width) / self.width,(self.height - y) / self.height);
+        region.texture_to_displaylist();
+
+class AtlasRegion(glux.texture.Texture):
+
+    def __init__(self,atlas,surface,base=None,square_shadow=False):
+
+        self._alpha = 1;
+        self.atlas = atlas;
+        self.surface = surface;
+
+        self.width = surface.get_width();
+        self.height = surface.get_height();
+        self.longest_side = max(self.width,self.height);
+        self.square_shadow = square_shadow;
+        self.white_variant = None;
+        self._white_pixels = None;
+
+        if base == None:
+            self.base = None;
+        else:
+            self.base = p.Rect(*base);
+
+        #Filled in when the atlas is built
+        self.page = None;
+        self.tex = None;
+        self.atlas_pos = None;
+
+    def give_white_variant(self):
+
+        #Reading back the page would give the whole atlas, so use our own pixels
+        if self._white_pixels == None:
+            self._white_pixels = glux.texture.rgba_to_white_mask(p.image.tostring(self.surface,'RGBA',1));
+
+        return glux.texture.Texture.give_white_variant(self);
+
+    def delete(self):
+
+        #The texture belongs to the atlas, only the displaylist is ours
+        if getattr(self,'list',None) != None:
+            glux.resources.manager.release('display_list',self.list);
+            self.list = None;
@@ -0,0 +1,157 @@
+import numpy
+from OpenGL.GL import *
+
+import glux.texture
+import glux.glyphs
+import glux.streaming
+
+#Corners of a sprite in the order of the Texture displaylist, as fractions of its size
+_CORNERS = numpy.array([[0,0],[0,1],[1,1],[1,0]],dtype=numpy.float32);
+
+class SpriteBatch():
+    """Collects sprites and draws all sprites that share a texture with one draw call.
+
+    If ordered is True, only sprites drawn right after each other are combined, so overlapping
+    sprites end up exactly as with Texture.draw. Otherwise all sprites of a texture are drawn together.""";
+
+    def __init__(self,ordered=True):
+
+        self.ordered = ordered;
+        self.draw_calls = 0;
+        self._clear();
+
+    def _clear(self):
+
+        self.textures = [];
+        self.sprites = []; #x, y, width, height, rotation, centerx, centery, r, g, b, a, uv left, bottom, right, top
+
+    def __len__(self):
+
+        return len(self.sprites);
+
+    def can_draw(self,source):
+
+        return isinstance(source,(glux.texture.Texture,glux.texture.Animation,glux.glyphs.GlyphText));
+
+    def add(self,source,dest,rotation=None,color=None):
+        """Dest is in OpenGL coordinates, like for Texture.draw; color multiplies the texture""";
+
+        if isinstance(source,glux.texture.Textblock):
+            self._add_textblock(source,dest,color);
+            return;
+
+        if isinstance(source,glux.glyphs.GlyphText):
+            self._add_glyphtext(source,dest,color);
+            return;
+
+        #Animations draw their current frame, with their own alpha
+        alpha = source._alpha;
+
+        if isinstance(source,glux.texture.Animation):
+            source = source.frames[source.current_frame];
+
+        if color == None:
+            color = (1,1,1,1);
+
+        if rotation == None:
+            rotation = 0;
+
+        centerx, centery = source.rotation_center;
+
+        self.textures.append(source);
+        self.sprites.append((dest[0],dest[1],source.width,source.height,rotation,centerx,centery,
+                             color[0],color[1],color[2],color[3] * alpha)+tuple(source.uv));
+
+    def _add_textblock(self,textblock,dest,color):
+
+        #Same placement as Textblock.draw
+        x, y = dest;
+        original_x = x;
+
+        for i in textblock.images:
+            if textblock.center:
+                x = round(original_x + (textblock.width - i.width) / 2);
+
+            self.add(i,(x,y),color=color);
+            y -= textblock.height;
+
+    def _add_glyphtext(self,text,dest,color):
+
+        if color == None:
+            color = (1,1,1,1);
+
+        color = (color[0],color[1],color[2],color[3] * text._alpha);
+
+        for region,x in text.glyphs:
+            self.add(region,(dest[0]+x,dest[1]),color=color);
+
+    def flush(self):
+
+        if len(self.sprites) == 0:
+            return;
+
+        sprites = numpy.array(self.sprites,dtype=numpy.float64);
+        texture_ids = numpy.array([t.tex for t in self.textures],dtype=numpy.int64);
+
+        if not self.ordered:
+            order = numpy.argsort(texture_ids,kind='stable');
+            sprites = sprites[order];
+            texture_ids = texture_ids[order];
+
+        vertices, texcoords, colors = _sprites_to_arrays(sprites);
+
+        glLoadIdentity();
+
+        glEnableClientState(GL_VERTEX_ARRAY);
+        glEnableClientState(GL_COLOR_ARRAY);
+        glEnableClientState(GL_TEXTURE_COORD_ARRAY);
+
+        stream = glux.streaming.get_stream_buffer();
+        vertex_offset, color_offset, texcoord_offset = stream.write(vertices,colors,texcoords);
+
+        glVertexPointer(2,GL_FLOAT,0,vertex_offset);
+        glColorPointer(4,GL_FLOAT,0,color_offset);
+        glTexCoordPointer(2,GL_FLOAT,0,texcoord_offset);
+
+        #One draw call per run of sprites with the same texture
+        starts = numpy.flatnonzero(numpy.r_[True,texture_ids[1:] != texture_ids[:-1]]);
+        ends = numpy.r_[starts[1:],len(texture_ids)];
+
+        for start,end in zip(starts,ends):
+            glBindTexture(GL_TEXTURE_2D,int(texture_ids[start]));
+            glDrawArrays(GL_QUADS,int(start) * 4,int(end - start) * 4);
+
+        stream.unbind();
+        glDisableClientState(GL_TEXTURE_COORD_ARRAY);
+        glDisableClientState(GL_COLOR_ARRAY);
+        glDisableClientState(GL_VERTEX_ARRAY);
+
+        self.draw_calls += len(starts);
+        self._clear();
+
+def _sprites_to_arrays(sprites):
+
+    n = len(sprites);
+    x, y, width, height, rotation, centerx, centery = sprites[:,:7].T;
+
+    #Corners relative to the rotation center
+    corners_x = _CORNERS[None,:,0] * width[:,None] - centerx[:,None];
+    corners_y = _CORNERS[None,:,1] * height[:,None] - centery[:,None];
+
+    #Same rotation as glRotate(rotation,0,0,-1)
+    radians = numpy.radians(rotation)[:,None];
+    cos = numpy.cos(radians);
+    sin = numpy.sin(radians);
+
+    vertices = numpy.empty((n,4,2),dtype=numpy.float32);
+    vertices[:,:,0] = x[:,None] + centerx[:,None] + corners_x * cos + corners_y * sin;
+    vertices[:,:,1] = y[:,None] + centery[:,None] - corners_x * sin + corners_y * cos;
+
+    #Stretch the corners over the part of the texture each sprite uses
+    left, bottom, right, top = sprites[:,11:15].T;
+    texcoords = numpy.empty((n,4,2),dtype=numpy.float32);
+    texcoords[:,:,0] = left[:,None] + _CORNERS[None,:,0] * (right - left)[:,None];
+    texcoords[:,:,1] = bottom[:,None] + _CORNERS[None,:,1] * (top - bottom)[:,None];
+    colors = numpy.repeat(sprites[:,7:11].astype(numpy.float32),4,axis=0);
+
+    return vertices.reshape(-1,2), texcoords.reshape(-1,2), colors;
@@ -0,0 +1,306 @@
+"""Benchmarks for glux. Run with python -m glux.benchmark; see --help for the options.
+
+Without a display (or with --headless), it runs on an offscreen context, for example llvmpipe via EGL.""";
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+import subprocess
+
+import pygame as p
+from OpenGL.GL import *
+
+#After OpenGL.GL, which has a platform of its own
+import platform
+
+import glux
+
+#Environment for an offscreen context without a display
+_HEADLESS_ENVIRONMENT = {'SDL_VIDEODRIVER': 'offscreen','PYOPENGL_PLATFORM': 'egl'};
+
+def _box(width,height,color):
+
+    surface = p.Surface((width,height),p.SRCALPHA);
+    surface.fill((0,0,0,0));
+    surface.fill(color,(2,height//4,width-4,height-height//4));
+
+    return surface;
+
+def lights_scenario(window,lights=8,casters=200,seed=0):
+    """Lights moving around between shadowcasters, so every light is rendered again every frame.
+
+    Its retained blocks per frame are not a leak, but a working set that goes up and down: lights at
+    the edge of the window are clipped to a new size almost every frame, so the render target pool
+    keeps making targets (with their finalizers) and deletes them again after max_unused_frames, and
+    the render cache keys grow and shrink with the number of casters near each light. A leak shows as
+    a number that stays the same or grows when measuring over more frames.""";
+
+    rng = random.Random(seed);
+
+    caster = glux.Texture(_box(32,48,(150,90,40,255)));
+    window.set_shadowcasters([(caster,(rng.randint(0,window.width-32),rng.randint(0,window.height-48)))
+                              for i in range(casters)]);
+
+    light_list = [glux.Light((rng.randint(100,255),rng.randint(100,255),rng.randint(100,255),255),
+                             rng.randint(80,200),True) for i in range(lights)];
+    positions = [[rng.randint(0,window.width),rng.randint(0,window.height)] for i in range(lights)];
+    background = glux.Texture(_box(window.width,window.height,(90,120,90,255)));
+
+    def frame(i):
+
+        for light,pos in zip(light_list,positions):
+            pos[0] = (pos[0] + 3) % window.width;
+            light.render(pos,window);
+
+        window.build_lighting(light_list,[]);
+        window.draw(background,(0,0));
+        window.draw_lighting();
+
+    return frame;
+
+def sprites_scenario(window,sprites=10000,seed=0,ordered=True):
+    """Many small sprites of a few textures, batched""";
+
+    rng = random.Random(seed);
+
+    textures = [glux.Texture(_box(16,16,color)) for color in [(255,0,0,255),(0,255,0,255),(0,0,255,255),(255,255,0,255)]];
+    placed = [(rng.choice(textures),(rng.randint(0,window.width-16),rng.randint(0,window.height-16)))
+              for i in range(sprites)];
+
+    def frame(i):
+
+        window.fill((0,0,0,0));
+        window.begin_batch(ordered);
+
+        for texture,pos in placed:
+            window.draw(texture,pos);
+
+        window.end_batch();
+
+    return frame;
+
+def sprites_unordered_scenario(window,sprites=10000,seed=0):
+    """The same sprites in an unordered batch, which draws them texture by texture""";
+
+    return sprites_scenario(window,sprites,seed,False);
+
+def animations_scenario(window,animations=2000,seed=0):
+    """Many copies of an animation, each at its own position in it""";
+
+    rng = random.Random(seed);
+
+    frames = [glux.Texture(_box(24,24,(60*i,120,200,255))) for i in range(4)];
+    animation = glux.Animation.from_frames(frames,90);
+    placed = [];
+
+    for i in range(animations):
+        copy = animation.copy();
+        copy.tick(rng.randint(0,40));
+        placed.append((copy,(rng.randint(0,window.width-24),rng.randint(0,window.height-24))));
+
+    def frame(i):
+
+        window.fill((0,0,0,0));
+        window.begin_batch();
+
+        for copy,pos in placed:
+            copy.tick();
+            window.draw(copy,pos);
+
+        window.end_batch();
+
+    return frame;
+
+def text_scenario(window,labels=40):
+    """A HUD whose numbers change every frame""";
+
+    font = p.font.Font(None,20);
+    texts = [glux.GlyphText('',font,(255,255,255)) for i in range(labels)];
+    block = glux.Textblock('',font,(255,255,0),300);
+
+    def frame(i):
+
+        window.fill((0,0,0,0));
+        window.begin_batch();
+
+        for n,text in enumerate(texts):
+            text.change_text('Score %d: %d' % (n,i * 7 + n));
+            window.draw(text,(10 + (n % 4) * 150,10 + (n // 4) * 22));
+
+        block.change_text('Frame %d of the benchmark, with a timer at %.2f seconds' % (i,i / 60));
+        window.draw(block,(10,300));
+
+        window.end_batch();
+
+    return frame;
+
+SCENARIOS = {'lights': lights_scenario,
+             'sprites': sprites_scenario,
+             'sprites_unordered': sprites_unordered_scenario,
+             'animations': animations_scenario,
+             'text': text_scenario};
+
+def run_scenario(window,name,frames=200,warmup=20,allocation_frames=20,**options):
+    """Times the frames of a scenario and returns fps, ms per frame percentiles and allocations.
+
+    Retained blocks per frame are the allocations still alive after allocation_frames frames, divided
+    by that number; see lights_scenario for why it isn't always close to 0.""";
+
+    frame = SCENARIOS[name](window,**options);
+
+    for i in range(warmup):
+        frame(i);
+        window.update();
+
+    glFinish();
+
+    times = [];
+
+    for i in range(frames):
+        start = time.perf_counter();
+
+        frame(warmup + i);
+        window.update();
+        glFinish();
+
+        times.append(time.perf_counter() - start);
+
+    #Allocations separately, as tracing makes everything slower
+    tracemalloc.start();
+    before = tracemalloc.take_snapshot();
+
+    for i in range(allocation_frames):
+        frame(warmup + frames + i);
+        window.update();
+
+    after = tracemalloc.take_snapshot();
+    peak = tracemalloc.get_traced_memory()[1];
+    tracemalloc.stop();
+
+    retained_blocks = sum(stat.count_diff for stat in after.compare_to(before,'filename'));
+
+    times.sort();
+    total = sum(times);
+
+    return {'frames': frames,
+            'fps': frames / total,
+            'mean_ms': total / frames * 1000,
+            'p50_ms': _percentile(times,50) * 1000,
+            'p95_ms': _percentile(times,95) * 1000,
+            'p99_ms': _percentile(times,99) * 1000,
+            'peak_kb': peak / 1024,
+            'retained_blocks_per_frame': retained_blocks / allocation_frames};
+
+def _percentile(sorted_values,percent):
+
+    index = min(len(sorted_values) - 1,int(round(percent / 100 * (len(sorted_values) - 1))));
+
+    return sorted_values[index];
+
+def compare(results,baseline,threshold=10):
+    """Lines describing the change of every scenario, and whether any got more than threshold percent slower""";
+
+    lines = [];
+    regressed = False;
+
+    for name,result in results.items():
+        if name not in baseline.get('scenarios',{}):
+            continue;
+
+        old = baseline['scenarios'][name]['mean_ms'];
+        change = (result['mean_ms'] - old) / old * 100;
+
+        if change > threshold:
+            regressed = True;
+            verdict = 'SLOWER';
+        elif change < -threshold:
+            verdict = 'faster';
+        else:
+            verdict = '';
+
+        lines.append('%-17s %8.2f ms -> %8.2f ms  %+6.1f%%  %s' % (name,old,result['mean_ms'],change,verdict));
+
+    return lines, regressed;
+
+def main(arguments=None):
+
+    parser = argparse.ArgumentParser(prog='python -m glux.benchmark',description='Benchmarks for glux');
+    parser.add_argument('scenarios',nargs='*',default=list(SCENARIOS),help='any of ' + ', '.join(SCENARIOS));
+    parser.add_argument('--frames',type=int,default=200);
+    parser.add_argument('--warmup',type=int,default=20);
+    parser.add_argument('--width',type=int,default=800);
+    parser.add_argument('--height',type=int,default=600);
+    parser.add_argument('--lights',type=int,default=8);
+    parser.add_argument('--casters',type=int,default=200);
+    parser.add_argument('--sprites',type=int,default=10000);
+    parser.add_argument('--save',help='write the results to this json file, to compare with later');
+    parser.add_argument('--compare',help='a json file saved earlier with --save');
+    parser.add_argument('--threshold',type=float,default=10,help='percentage of slowdown that counts as a regression');
+    parser.add_argument('--headless',action='store_true',help='use an offscreen context even if there is a display');
+    if arguments == None:
+        arguments = sys.argv[1:];
+
+    raw_arguments = arguments;
+    arguments = parser.parse_args(arguments);
+
+    #The OpenGL platform can't be changed once OpenGL is imported, so start again with the right environment
+    headless = arguments.headless or (platform.system() == 'Linux' and 'DISPLAY' not in os.environ
+                                      and 'WAYLAND_DISPLAY' not in os.environ);
+
+    if headless and any(os.environ.get(key) != value for key,value in _HEADLESS_ENVIRONMENT.items()):
+        environment = dict(os.environ,**_HEADLESS_ENVIRONMENT);
+        return subprocess.call([sys.executable,'-m','glux.benchmark'] + list(raw_arguments),env=environment);
+
+    p.init();
+    window = glux.Window();
+    window.start(arguments.width,arguments.height,'glux benchmark');
+
+    options = {'lights': {'lights': arguments.lights,'casters': arguments.casters},
+               'sprites': {'sprites': arguments.sprites},
+               'sprites_unordered': {'sprites': arguments.sprites}};
+
+    renderer = glGetString(GL_RENDERER);
+    print('Renderer: %s' % (renderer.decode() if renderer != None else 'unknown'));
+    print('%-17s %8s %9s %9s %9s %9s %10s %8s' % ('scenario','fps','mean ms','p50 ms','p95 ms','p99 ms','peak kB','blocks'));
+
+    results = {};
+
+    for name in arguments.scenarios:
+
+        #Every scenario starts from an empty window
+        window.set_shadowcasters([]);
+        result = run_scenario(window,name,arguments.frames,arguments.warmup,**options.get(name,{}));
+        results[name] = result;
+
+        print('%-17s %8.1f %9.2f %9.2f %9.2f %9.2f %10.1f %8.1f' % (name,result['fps'],result['mean_ms'],result['p50_ms'],
+                                                               result['p95_ms'],result['p99_ms'],result['peak_kb'],
+                                                               result['retained_blocks_per_frame']));
+
+    window.close();
+
+    if arguments.save != None:
+        with open(arguments.save,'w') as f:
+            json.dump({'renderer': renderer.decode() if renderer != None else None,
+                       'python': platform.python_version(),'scenarios': results},f,indent=1);
+
+    if arguments.compare != None:
+        with open(arguments.compare) as f:
+            baseline = json.load(f);
+
+        lines, regressed = compare(results,baseline,arguments.threshold);
+        print();
+
+        for line in lines:
+            print(line);
+
+        if regressed:
+            return 1;
+
+    return 0;
+
+if __name__ == '__main__':
+    sys.exit(main());
@@ -0,0 +1,39 @@
+class Camera():
+    """Which part of the world the window shows. Window.draw takes world coordinates while a camera
+    is set, and skips things that end up outside the window""";
+
+    def __init__(self,x=0,y=0):
+
+        self.x = x;
+        self.y = y;
+
+        #How many things were drawn and skipped; the last_ ones are from the previous frame
+        self.drawn = 0;
+        self.culled = 0;
+        self.last_drawn = 0;
+        self.last_culled = 0;
+
+    def move_to(self,x,y):
+
+        self.x = x;
+        self.y = y;
+
+    def move(self,x,y):
+
+        self.x += x;
+        self.y += y;
+
+    def world_to_screen(self,coords):
+
+        return (coords[0] - self.x, coords[1] - self.y);
+
+    def screen_to_world(self,coords):
+
+        return (coords[0] + self.x, coords[1] + self.y);
+
+    def end_frame(self):
+
+        self.last_drawn = self.drawn;
+        self.last_culled = self.culled;
+        self.drawn = 0;
+        self.culled = 0;
@@ -0,0 +1,96 @@
+import os
+import json
+import hashlib
+import tempfile
+
+import glux.texture
+
+class TextureCache():
+    """Keeps decoded images on disk as raw RGBA, with their white masks, so loading them is just reading a file.
+
+    Entries are keyed on the contents of the image file and the loading options, so changed
+    images are decoded again. Use glux.set_texture_cache to make Texture and Animation use it.""";
+
+    version = 1;
+
+    def __init__(self,directory):
+
+        self.directory = directory;
+        self.hits = 0;
+        self.misses = 0;
+
+        os.makedirs(directory,exist_ok=True);
+
+    def get_key(self,filename,colorkey=None,transparent=False):
+
+        with open(filename,'rb') as f:
+            content = f.read();
+
+        key = hashlib.sha1(content);
+        key.update(repr((self.version,colorkey,transparent)).encode());
+
+        return key.hexdigest();
+
+    def get(self,filename,colorkey=None,transparent=False):
+        """Pixels, width, height and white pixels of the image; decodes and stores it if needed""";
+
+        key = self.get_key(filename,colorkey,transparent);
+        entry = self.load(key);
+
+        if entry != None:
+            self.hits += 1;
+            return entry;
+
+        self.misses += 1;
+        pixels, width, height = glux.texture.decode_image(filename,colorkey,transparent);
+        white_pixels = glux.texture.rgba_to_white_mask(pixels);
+        self.store(key,pixels,width,height,white_pixels);
+
+        return pixels, width, height, white_pixels;
+
+    def load(self,key):
+
+        metadata_file = self._path(key,'json');
+
+        #The metadata is written last, so without it the entry is incomplete
+        if not os.path.exists(metadata_file):
+            return None;
+
+        with open(metadata_file) as f:
+            metadata = json.load(f);
+
+        return self._read(key,'rgba'), metadata['width'], metadata['height'], self._read(key,'white');
+
+    def store(self,key,pixels,width,height,white_pixels):
+
+        self._write(key,'rgba',pixels);
+        self._write(key,'white',white_pixels);
+        self._write(key,'json',json.dumps({'width': width, 'height': height}).encode());
+
+    def clear(self):
+
+        for f in os.listdir(self.directory):
+            if f.endswith('.rgba') or f.endswith('.white') or f.endswith('.json') or f.endswith('.tmp'):
+                os.remove(os.path.join(self.directory,f));
+
+    def _path(self,key,extension):
+
+        return os.path.join(self.directory,key+'.'+extension);
+
+    def _write(self,key,extension,data):
+
+        #Write next to it and move it in place, so readers never see half a file; every writer gets its
+        #own temporary file, as two threads can decode the same image at once
+        descriptor, temporary = tempfile.mkstemp(suffix='.tmp',dir=self.directory);
+
+        with os.fdopen(descriptor,'wb') as f:
+            f.write(data);
+
+        os.replace(temporary,self._path(key,extension));
+
+    def _read(self,key,extension):
+
+        #Plain bytes instead of a memory map: textures keep their white pixels, which would keep a map
+        #(and a file descriptor) open per texture, and worker processes can send bytes back to the parent
+        with open(self._path(key,extension),'rb') as f:
+            return f.read();
@@ -1,4 +1,5 @@
 import math
+import numpy
 
 def distance(x,y):
     """Pythogorian distance""";
@@ -58,3 +59,47 @@ def coords_to_angle(c1,c2):
         degrees += 180;
 
     return degrees;
+
+#Array versions of the functions above, for many points at once. Points are arrays of shape (n,2),
+#or a single point, which is then used for all of them.
+
+def distances(points1,points2):
+
+    difference = numpy.asarray(points2,dtype=numpy.float64) - numpy.asarray(points1,dtype=numpy.float64);
+
+    return numpy.hypot(difference[...,0],difference[...,1]);
+
+def turn_around_degrees_many(angles,add):
+
+    angles = numpy.asarray(angles,dtype=numpy.float64) + add;
+
+    return numpy.where(angles > 359,angles - 360,angles);
+
+def angles_to_locs(startlocs,angles,distances):
+
+    radians = numpy.radians(angles);
+    startlocs = numpy.asarray(startlocs,dtype=numpy.float64);
+
+    return startlocs + numpy.stack([numpy.sin(radians) * distances,numpy.cos(radians) * distances],axis=-1);
+
+def coords_to_angles(c1,c2):
+    """Same angles as coords_to_angle, except straight up, down and left, where coords_to_angle is off""";
+
+    difference = numpy.asarray(c2,dtype=numpy.float64) - numpy.asarray(c1,dtype=numpy.float64);
+    degrees = numpy.degrees(-numpy.arctan2(difference[...,1],difference[...,0])) % 360;
+
+    #Tiny negative angles can end up as exactly 360
+    return numpy.where(degrees >= 360,degrees - 360,degrees);
+
+def distances_to_coords_via_points(starts,distances,vias):
+    """The points distance further along the lines from starts through vias""";
+
+    vias = numpy.asarray(vias,dtype=numpy.float64);
+    direction = vias - numpy.asarray(starts,dtype=numpy.float64);
+    length = numpy.hypot(direction[...,0],direction[...,1]);
+
+    #Like distance_to_coord_via_point, go right if start and via are the same point
+    direction = numpy.where((length == 0)[...,None],(1,0),direction);
+    length = numpy.where(length == 0,1,length);
+
+    return vias + direction * (distances / length)[...,None];
@@ -0,0 +1,110 @@
+import glux.atlas
+import glux.batch
+
+#One glyph atlas per font and color, shared by all GlyphTexts that use them
+_glyph_atlases = {};
+
+def get_glyph_atlas(font,color):
+
+    key = (id(font),tuple(color));
+
+    if key not in _glyph_atlases:
+        _glyph_atlases[key] = GlyphAtlas(font,color);
+
+    return _glyph_atlases[key];
+
+def clear_glyph_atlases():
+    """Frees the pages of all glyph atlases; GlyphTexts made before can't be drawn anymore""";
+
+    for glyph_atlas in _glyph_atlases.values():
+        for page in glyph_atlas.atlas.pages:
+            page.delete();
+
+    _glyph_atlases.clear();
+
+class GlyphAtlas():
+    """Every character of a font in a color, rendered once and kept in a TextureAtlas""";
+
+    def __init__(self,font,color,page_size=512):
+
+        self.font = font;
+        self.color = color;
+        self.height = font.get_height();
+
+        self.atlas = glux.atlas.TextureAtlas(page_size);
+        self.glyphs = {}; #character -> (AtlasRegion or None for blank ones, advance)
+
+    def get_glyphs(self,text):
+
+        new = False;
+
+        for char in set(text):
+            if char in self.glyphs:
+                continue;
+
+            surface = self.font.render(char,True,self.color);
+
+            if char.isspace() or surface.get_width() == 0:
+                region = None;
+            else:
+                region = self.atlas.add(surface);
+                new = True;
+
+            self.glyphs[char] = (region,surface.get_width());
+
+        #Only upload the characters that were added; the others keep their place, as sprites that are
+        #waiting in a SpriteBatch still point at it
+        if new:
+            self.atlas.update();
+
+        return [self.glyphs[char] for char in text];
+
+    def measure(self,text):
+
+        return sum(advance for region,advance in self.get_glyphs(text));
+
+class GlyphText():
+    """Like Text, but drawn from cached glyphs, so changing the text is cheap. There is no kerning,
+    so it can be a pixel or so wider than Text.""";
+
+    rotation_center = (0,0);
+
+    def __init__(self,text,font,color):
+
+        self._alpha = 1;
+        self.glyph_atlas = get_glyph_atlas(font,color);
+        self.height = self.glyph_atlas.height;
+
+        self.change_text(text);
+
+    def change_text(self,text):
+
+        self.text = text;
+
+        #Where each visible glyph goes, relative to the start of the text
+        self.glyphs = [];
+        x = 0;
+
+        for region,advance in self.glyph_atlas.get_glyphs(text):
+            if region != None:
+                self.glyphs.append((region,x));
+
+            x += advance;
+
+        self.width = x;
+
+    @property
+    def alpha(self):
+
+        return self._alpha;
+
+    @alpha.setter
+    def alpha(self,value):
+
+        self._alpha = value;
+
+    def draw(self,dest,rotation=None):
+
+        batch = glux.batch.SpriteBatch();
+        batch.add(self,dest);
+        batch.flush();
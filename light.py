@@ -1,3 +1,7 @@
+import math
+import pygame as p
+from OpenGL.GL import GL_RGBA
+
 import glux.texture
 import glux.geometry
 from glux.shape import Disk
@@ -14,18 +18,63 @@ class Light():
         self.disk = Disk(strength,color,(0,0,0,0));
 #        self.disk = Disk(strength,color,color);
         self.tex = None;
+        self.area = None; #The part of the window the texture covers, as (x,y,width,height)
+        self.tex_offset = (0,0); #Where that part starts, in OpenGL coordinates
+        self.shadow_tex = None; #Only kept when a lighting engine does the rest
+        self.screen_pos = None;
+
+        #Render cache: the texture is reused as long as nothing it depends on changes
+        self.cache = True;
+        self.cache_hits = 0;
+        self.cache_misses = 0;
+        self._cache_key = None;
+        self._rendered = False; #With a lighting engine there is no tex, so keep track of it separately
+        self._disk_state = (strength,color);
+
+        #Goes up every time the light is really rendered, so build_lighting knows what changed
+        self.version = 0;
+
+    def invalidate(self):
+        """Makes sure the next render really renders""";
+
+        self._cache_key = None;
+
+    def _get_cache_key(self,pos,window,width,height):
+
+        key = (tuple(pos),self.strength,tuple(self.color),self.shadows,width,height,window.inside,
+               window.get_camera_offset(),window.lighting_engine != None);
+
+        if self.shadows and window.shadowbatch != None:
+
+            #Every caster that can either cast a shadow or be lit by this light
+            casters = window.find_shadowcasters(pos,max(self.visibility_distance,self.strength));
+            batch = window.shadowbatch;
+            key += tuple((i,id(batch.casters[i]),tuple(batch.positions[i])) for i in sorted(casters));
+
+        return key;
 
     def draw(self,pos):
 
         if self.tex != None:
-            self.tex.draw(pos);
+            self.tex.draw((pos[0]+self.tex_offset[0],pos[1]+self.tex_offset[1]));
         else:
             raise LightNotRenderedError;
 
+    def get_area(self,pos,width,height):
+        """The bounding box of the disk, clipped to the width x height part of the window""";
+
+        left = max(0,math.floor(pos[0] - self.strength));
+        top = max(0,math.floor(pos[1] - self.strength));
+        right = min(width,math.ceil(pos[0] + self.strength));
+        bottom = min(height,math.ceil(pos[1] + self.strength));
+
+        #Always at least one pixel, even if the light is off screen
+        right = max(right,left+1);
+        bottom = max(bottom,top+1);
+
+        return (left,top,right-left,bottom-top);
+
     def render(self,pos,window,width=None,height=None):
-    
-        #Manual garbage collection
-        del self.tex;
 
         if width == None:
             width = window.width;
@@ -33,27 +82,54 @@ class Light():
         if height == None:
             height = window.height;
 
-        if self.shadows:
+        #Nothing changed since last time? Then the old texture is still right
+        if self.cache:
+            key = self._get_cache_key(pos,window,width,height);
 
-            #Create the (empty) shadow layer
-            transtex = glux.texture.create_transparent_texture(width,height);
+            if self._rendered and key == self._cache_key:
+                self.cache_hits += 1;
+                return;
 
-            #Render shadowlayer
-            window.change_rendermode('texture',transtex);
+            self.cache_misses += 1;
+            self._cache_key = key;
 
-            #Draw shadows
-            for caster,casterpos in window.shadowcasters:
-                if glux.geometry.distance(pos,caster.get_center(casterpos)) < \
-                   self.visibility_distance + caster.longest_side:
-                    window.draw_shadow(self,pos,caster,casterpos);
+        self.version += 1;
 
-            window.draw_white_shadowcasters();
+        #Strength or color might have been changed since the disk was made
+        if self._disk_state != (self.strength,self.color):
+            self.visibility_distance = self.strength * 0.5;
+            self.disk = Disk(self.strength,self.color,(0,0,0,0));
+            self._disk_state = (self.strength,self.color);
+
+        #Give the previous textures back, so they can be reused
+        self._rendered = False;
 
-            window.change_rendermode('window');
-            shadowtex = window.render_texture;
+        if self.tex != None:
+            window.render_targets.release(self.tex);
+            self.tex = None;
+
+        if self.shadow_tex != None:
+            window.render_targets.release(self.shadow_tex);
+            self.shadow_tex = None;
+
+        #Everything outside the disk stays dark, so only render the disk's part of the window
+        self.screen_pos = window.world_to_screen(pos);
+        self.area = self.get_area(self.screen_pos,width,height);
+        x, y, area_width, area_height = self.area;
+
+        #A lighting engine draws the disk and the white shadowcasters itself, it only needs the shadows
+        if window.lighting_engine != None:
+            if self.shadows:
+                self.shadow_tex = self.render_shadows(pos,window,False);
+
+            self._rendered = True;
+            return;
+
+        if self.shadows:
+            shadowtex = self.render_shadows(pos,window);
 
         #Render this light
-        window.change_rendermode('texture',width=width,height=height);
+        window.change_rendermode('texture',width=area_width,height=area_height,offset=(x,y));
 
         window.fill((0,0,0,0));
         window.draw(self.disk,pos);
@@ -61,13 +137,38 @@ class Light():
         #Put the shadowlayer on top
         if self.shadows:
             window.change_blendmode('multiply');
-            window.draw(shadowtex,(0,0));
+            window.draw(shadowtex,(x,y),screen=True);
             window.change_blendmode('alpha');
 
-            del shadowtex;
+            window.render_targets.release(shadowtex);
 
         window.change_rendermode('window');
         self.tex = window.render_texture;
+        self.tex_offset = window.translate_coords((x,y),area_height);
+        self._rendered = True;
+
+    def render_shadows(self,pos,window,white_shadowcasters=True):
+        """Renders the shadow layer of the light's area: white, with the shadows in black""";
+
+        x, y, area_width, area_height = self.area;
+
+        #Create the (empty) shadow layer
+        shadowtex = window.render_targets.acquire(area_width,area_height,GL_RGBA);
+
+        #Render shadowlayer
+        window.change_rendermode('texture',shadowtex,offset=(x,y));
+        window.fill((1,1,1,0));
+
+        #Draw shadows of the casters that are near enough
+        casters = window.find_shadowcasters(pos,self.visibility_distance);
+        window.draw_shadows(self,pos,casters);
+
+        if white_shadowcasters:
+            window.draw_white_shadowcasters();
+
+        window.change_rendermode('window');
+
+        return shadowtex;
 
 class Glower(glux.texture.Texture):
 
@@ -82,6 +183,7 @@ class Glower(glux.texture.Texture):
             current_surface = None;
 
         #Set some properties
+        self._alpha = 1;
         self.width = current_surface.get_width();
         self.height = current_surface.get_height();
 
@@ -0,0 +1,123 @@
+import collections
+
+class LightMapStore():
+    """The lighting textures build_lighting makes, by key. Textures come from a RenderTargetPool and go
+    back to it when they are replaced, released, expire or are evicted, so maps of the same size are
+    reused across keys.
+
+    A map with a lifetime is released when it hasn't been built or drawn for that many frames. With a
+    budget (in bytes), the least recently used maps are evicted to stay under it.""";
+
+    def __init__(self,render_targets,budget=None):
+
+        self.render_targets = render_targets;
+        self.budget = budget;
+        self.frame = 0;
+        self.evictions = 0;
+
+        self.maps = collections.OrderedDict(); #key -> texture, least recently used first
+        self.lifetimes = {}; #key -> frames
+        self.last_used = {}; #key -> frame
+
+    def __contains__(self,key):
+
+        return key in self.maps;
+
+    def __getitem__(self,key):
+
+        self._use(key);
+
+        return self.maps[key];
+
+    def __len__(self):
+
+        return len(self.maps);
+
+    def keys(self):
+
+        return list(self.maps.keys());
+
+    def get(self,key,default=None):
+
+        if key not in self.maps:
+            return default;
+
+        return self[key];
+
+    def set(self,key,texture,lifetime=None):
+
+        if key in self.maps and self.maps[key] is not texture:
+            self.render_targets.release(self.maps[key]);
+
+        self.maps[key] = texture;
+        self.lifetimes[key] = lifetime;
+        self._use(key);
+
+        if self.budget != None:
+            self._evict(key);
+
+    def release(self,key):
+        """Gives the map back to the render target pool; don't use its texture afterwards""";
+
+        if key not in self.maps:
+            return;
+
+        self.render_targets.release(self.maps.pop(key));
+        del self.lifetimes[key];
+        del self.last_used[key];
+
+    def pop(self,key):
+        """Takes the map out of the store without releasing it; the caller should release it""";
+
+        texture = self.maps.pop(key);
+        del self.lifetimes[key];
+        del self.last_used[key];
+
+        return texture;
+
+    def clear(self):
+
+        for key in self.keys():
+            self.release(key);
+
+    def end_frame(self):
+        """Releases the maps whose lifetime is over""";
+
+        self.frame += 1;
+
+        for key in self.keys():
+            lifetime = self.lifetimes[key];
+
+            if lifetime != None and self.frame - self.last_used[key] > lifetime:
+                self.release(key);
+
+    def get_memory(self):
+        """Bytes of texture memory per key""";
+
+        return {key: _get_memory(texture) for key,texture in self.maps.items()};
+
+    @property
+    def memory(self):
+
+        return sum(self.get_memory().values());
+
+    def _use(self,key):
+
+        self.maps.move_to_end(key);
+        self.last_used[key] = self.frame;
+
+    def _evict(self,keep):
+
+        #Least recently used first; the map that was just set always stays
+        for key in self.keys():
+            if self.memory <= self.budget:
+                break;
+
+            if key != keep:
+                self.release(key);
+                self.evictions += 1;
+
+def _get_memory(texture):
+
+    #Render targets know their size; assume RGBA for anything else
+    return getattr(texture,'memory',texture.width * texture.height * 4);
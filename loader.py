@@ -0,0 +1,205 @@
+import time
+import concurrent.futures
+import pygame as p
+
+import glux.texture
+import glux.light
+
+class AssetLoader():
+    """Decodes images on worker threads (or processes) and turns them into textures later, a few per frame.
+
+    The load functions return an AssetHandle right away. Call process once per frame on the
+    thread that owns the OpenGL context; it uploads finished images until the time budget is used up.""";
+
+    def __init__(self,workers=4,processes=False):
+
+        if processes:
+            self.executor = concurrent.futures.ProcessPoolExecutor(workers);
+        else:
+            self.executor = concurrent.futures.ThreadPoolExecutor(workers);
+
+        self.jobs = [];
+
+    def __len__(self):
+
+        return len(self.jobs);
+
+    def load_texture(self,filename,colorkey=None,transparent=False,placeholder=None,**texture_options):
+        """Texture_options are passed on to Texture, like base and square_shadow""";
+
+        handle = AssetHandle(placeholder);
+        future = self.executor.submit(glux.texture.load_image_data,filename,colorkey,transparent);
+        self.jobs.append(_TextureJob(handle,[future],texture_options));
+
+        return handle;
+
+    def load_animation(self,name,speed,path=None,colorkey=None,placeholder=None):
+
+        handle = AssetHandle(placeholder);
+        futures = [];
+
+        for filename in glux.texture.find_animation_files(name,path):
+            futures.append(self.executor.submit(glux.texture.load_image_data,filename,colorkey,False));
+
+        self.jobs.append(_AnimationJob(handle,futures,speed));
+
+        return handle;
+
+    def load_glower(self,filename,color=None,colorkey=None,placeholder=None):
+
+        handle = AssetHandle(placeholder);
+        future = self.executor.submit(glux.texture.load_image_data,filename,None,True);
+        self.jobs.append(_GlowerJob(handle,[future],color,colorkey));
+
+        return handle;
+
+    def process(self,budget=4):
+        """Uploads decoded images for about budget milliseconds; returns how many handles became ready""";
+
+        deadline = time.perf_counter() + budget / 1000;
+        finished = 0;
+
+        for job in list(self.jobs):
+
+            if not job.upload_ready(deadline):
+                continue;
+
+            self.jobs.remove(job);
+            finished += 1;
+
+            if time.perf_counter() > deadline:
+                break;
+
+        return finished;
+
+    def wait(self):
+        """Blocks until everything is loaded""";
+
+        while len(self.jobs) > 0:
+            self.process(budget=float('inf'));
+
+            if len(self.jobs) > 0:
+                concurrent.futures.wait(self.jobs[0].futures);
+
+    def shutdown(self):
+
+        self.executor.shutdown(wait=False);
+
+class AssetHandle():
+    """Stands in for an asset that is still loading; Window.draw draws the placeholder (if any) until then""";
+
+    def __init__(self,placeholder=None):
+
+        self.placeholder = placeholder;
+        self.result = None;
+        self.error = None;
+
+    @property
+    def ready(self):
+
+        return self.result != None;
+
+    def get(self):
+        """The asset if it is loaded, else the placeholder""";
+
+        if self.result != None:
+            return self.result;
+
+        return self.placeholder;
+
+    def draw(self,dest,rotation=None):
+
+        source = self.get();
+
+        if source != None:
+            source.draw(dest,rotation);
+
+    def __getattr__(self,name):
+
+        #Once loaded, the handle behaves like the asset itself
+        result = self.__dict__.get('result');
+
+        if result == None:
+            raise AttributeError('%s is not available until the asset is loaded' % name);
+
+        return getattr(result,name);
+
+class _Job():
+
+    def __init__(self,handle,futures):
+
+        self.handle = handle;
+        self.futures = futures;
+        self.uploaded = [];
+
+    def upload_ready(self,deadline):
+        """Uploads as many decoded images as time allows, in order; returns whether the job is done""";
+
+        while len(self.uploaded) < len(self.futures):
+            future = self.futures[len(self.uploaded)];
+
+            if not future.done():
+                return False;
+
+            try:
+                self.uploaded.append(self.upload(*future.result()));
+            except Exception as e:
+                self.handle.error = e;
+                return True;
+
+            if time.perf_counter() > deadline and len(self.uploaded) < len(self.futures):
+                return False;
+
+        self.handle.result = self.finish();
+
+        return True;
+
+    def finish(self):
+
+        return self.uploaded[0];
+
+class _TextureJob(_Job):
+
+    def __init__(self,handle,futures,texture_options):
+
+        _Job.__init__(self,handle,futures);
+        self.texture_options = texture_options;
+
+    def upload(self,pixels,width,height,white_pixels):
+
+        texture = glux.texture.Texture(pixels,width=width,height=height,**self.texture_options);
+        texture._white_pixels = white_pixels;
+
+        return texture;
+
+class _AnimationJob(_Job):
+
+    def __init__(self,handle,futures,speed):
+
+        _Job.__init__(self,handle,futures);
+        self.speed = speed;
+
+    def upload(self,pixels,width,height,white_pixels):
+
+        texture = glux.texture.Texture(pixels,width=width,height=height);
+        texture._white_pixels = white_pixels;
+
+        return texture;
+
+    def finish(self):
+
+        return glux.texture.Animation.from_frames(self.uploaded,self.speed);
+
+class _GlowerJob(_Job):
+
+    def __init__(self,handle,futures,color,colorkey):
+
+        _Job.__init__(self,handle,futures);
+        self.color = color;
+        self.colorkey = colorkey;
+
+    def upload(self,pixels,width,height,white_pixels):
+
+        surface = p.image.fromstring(bytes(pixels),(width,height),'RGBA',True);
+
+        return glux.light.Glower(surface,self.color,self.colorkey);
@@ -0,0 +1,122 @@
+import numpy
+from OpenGL.GL import *
+
+import glux.streaming
+
+class PrimitiveBatch():
+    """Collects lines, polylines, rectangles and filled polygons, and draws them with one draw call
+    per line width (plus one for all filled shapes).
+
+    Positions are in OpenGL coordinates and colors are 0-1, like glux.shape.Line uses them. Filled
+    shapes are drawn before the lines, and thinner lines don't necessarily end up under thicker ones
+    drawn later; within one width, the order is kept.""";
+
+    def __init__(self):
+
+        self.draw_calls = 0;
+        self._clear();
+
+    def _clear(self):
+
+        self.lines = {}; #width -> [vertex arrays], [color arrays]
+        self.triangles = ([],[]);
+        self.count = 0;
+
+    def __len__(self):
+
+        return self.count;
+
+    def add_line(self,c1,c2,width,color):
+
+        self._add_segments(numpy.array([c1,c2],dtype=numpy.float32),width,color);
+
+    def add_polyline(self,points,width,color,closed=False):
+
+        points = numpy.asarray(points,dtype=numpy.float32).reshape(-1,2);
+
+        if closed:
+            points = numpy.concatenate([points,points[:1]]);
+
+        if len(points) < 2:
+            return;
+
+        #Every segment as a separate pair of vertices
+        segments = numpy.empty((len(points)-1,2,2),dtype=numpy.float32);
+        segments[:,0] = points[:-1];
+        segments[:,1] = points[1:];
+
+        self._add_segments(segments.reshape(-1,2),width,color);
+
+    def add_polygon(self,points,color):
+        """Filled; the polygon should be convex""";
+
+        points = numpy.asarray(points,dtype=numpy.float32).reshape(-1,2);
+
+        if len(points) < 3:
+            return;
+
+        #Split into a fan of triangles around the first point
+        triangles = numpy.empty((len(points)-2,3,2),dtype=numpy.float32);
+        triangles[:,0] = points[0];
+        triangles[:,1] = points[1:-1];
+        triangles[:,2] = points[2:];
+
+        vertices = triangles.reshape(-1,2);
+        self.triangles[0].append(vertices);
+        self.triangles[1].append(numpy.tile(numpy.asarray(color,dtype=numpy.float32),(len(vertices),1)));
+        self.count += 1;
+
+    def add_rect(self,corners,color,width=None):
+        """Corners in drawing order; without a width, the rectangle is filled""";
+
+        if width == None:
+            self.add_polygon(corners,color);
+        else:
+            self.add_polyline(corners,width,color,closed=True);
+
+    def _add_segments(self,vertices,width,color):
+
+        if width not in self.lines:
+            self.lines[width] = ([],[]);
+
+        self.lines[width][0].append(vertices);
+        self.lines[width][1].append(numpy.tile(numpy.asarray(color,dtype=numpy.float32),(len(vertices),1)));
+        self.count += 1;
+
+    def flush(self):
+
+        if self.count == 0:
+            return;
+
+        #Untextured, without any movement
+        glBindTexture(GL_TEXTURE_2D,0);
+        glLoadIdentity();
+
+        glEnableClientState(GL_VERTEX_ARRAY);
+        glEnableClientState(GL_COLOR_ARRAY);
+
+        if len(self.triangles[0]) > 0:
+            self._draw_arrays(GL_TRIANGLES,*self.triangles);
+
+        for width in self.lines:
+            glLineWidth(width);
+            self._draw_arrays(GL_LINES,*self.lines[width]);
+
+        glDisableClientState(GL_COLOR_ARRAY);
+        glDisableClientState(GL_VERTEX_ARRAY);
+
+        self._clear();
+
+    def _draw_arrays(self,mode,vertices,colors):
+
+        vertices = numpy.concatenate(vertices);
+
+        stream = glux.streaming.get_stream_buffer();
+        vertex_offset, color_offset = stream.write(vertices,numpy.concatenate(colors));
+
+        glVertexPointer(2,GL_FLOAT,0,vertex_offset);
+        glColorPointer(4,GL_FLOAT,0,color_offset);
+        glDrawArrays(mode,0,len(vertices));
+        stream.unbind();
+
+        self.draw_calls += 1;
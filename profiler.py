@@ -0,0 +1,199 @@
+import time
+import json
+import collections
+import functools
+import importlib
+
+#The profiler that is recording, if any
+active = None;
+
+#Methods that get their own timed section: module, class, method
+_SECTIONS = [('glux','Window','build_lighting'),
+             ('glux','Window','draw_lighting'),
+             ('glux','Window','change_rendermode'),
+             ('glux','Window','draw_shadows'),
+             ('glux.light','Light','render'),
+             ('glux.texture','Layer','freeze'),
+             ('glux.batch','SpriteBatch','flush'),
+             ('glux.primitives','PrimitiveBatch','flush'),
+             ('glux.shaderlight','ShaderLighting','build')];
+
+#OpenGL functions that are counted, and in which counter
+_COUNTED_CALLS = {'glDrawArrays': 'draw_calls',
+                  'glCallList': 'draw_calls',
+                  'glBegin': 'draw_calls',
+                  'glBindTexture': 'texture_binds',
+                  'glBindFramebufferEXT': 'framebuffer_switches',
+                  'glTexImage2D': 'texture_uploads',
+                  'glBufferData': 'buffer_uploads',
+                  'glBufferSubData': 'buffer_uploads'};
+
+#The modules that call OpenGL; each has its own copy of the names from OpenGL.GL
+_GL_MODULES = ['glux','glux.texture','glux.shape','glux.shadow','glux.rendertarget','glux.batch',
+               'glux.atlas','glux.primitives','glux.shaderlight','glux.streaming'];
+
+_BYTES_PER_PIXEL = {0x1907: 3, 0x1908: 4}; #GL_RGB, GL_RGBA
+
+class FrameProfiler():
+    """Records how long the main parts of every frame take and how many OpenGL calls they make.
+
+    Only costs something while recording: start puts timing wrappers around the methods and OpenGL
+    functions, stop takes them away again.""";
+
+    def __init__(self,frames=120):
+
+        self.frames = collections.deque(maxlen=frames);
+        self._patches = [];
+        self._stack = [];
+        self._new_frame();
+
+    def _new_frame(self):
+
+        self.current = {'start': time.perf_counter(),'sections': [],'counters': collections.Counter()};
+
+    def start(self):
+
+        global active;
+
+        if active != None:
+            active.stop();
+
+        for module_name,class_name,method_name in _SECTIONS:
+            cls = getattr(importlib.import_module(module_name),class_name);
+            self._patch(cls,method_name,_timed(self,class_name + '.' + method_name,getattr(cls,method_name)));
+
+        for module_name in _GL_MODULES:
+            module = importlib.import_module(module_name);
+
+            for function_name,counter in _COUNTED_CALLS.items():
+                if hasattr(module,function_name):
+                    self._patch(module,function_name,_counted(self,function_name,counter,getattr(module,function_name)));
+
+        active = self;
+        self._new_frame();
+
+    def stop(self):
+
+        global active;
+
+        for target,name,original in reversed(self._patches):
+            setattr(target,name,original);
+
+        self._patches = [];
+
+        if active == self:
+            active = None;
+
+    def _patch(self,target,name,replacement):
+
+        self._patches.append((target,name,getattr(target,name)));
+        setattr(target,name,replacement);
+
+    def begin(self,name):
+
+        self._stack.append((name,time.perf_counter()));
+
+    def end(self):
+
+        name, start = self._stack.pop();
+        self.current['sections'].append((name,start,time.perf_counter() - start,len(self._stack)));
+
+    def count(self,name,amount=1):
+
+        self.current['counters'][name] += amount;
+
+    def end_frame(self):
+
+        self.current['duration'] = time.perf_counter() - self.current['start'];
+        self.frames.append(self.current);
+        self._new_frame();
+
+    def get_summary(self):
+        """Per section and counter, the average per frame over the recorded frames""";
+
+        n = len(self.frames);
+
+        if n == 0:
+            return {'frames': 0};
+
+        sections = collections.defaultdict(lambda: {'calls': 0,'ms': 0});
+        counters = collections.Counter();
+
+        for frame in self.frames:
+            for name,start,duration,depth in frame['sections']:
+                sections[name]['calls'] += 1;
+                sections[name]['ms'] += duration * 1000;
+
+            counters.update(frame['counters']);
+
+        return {'frames': n,
+                'frame_ms': sum(frame['duration'] for frame in self.frames) * 1000 / n,
+                'sections': {name: {'calls': s['calls'] / n,'ms': s['ms'] / n} for name,s in sections.items()},
+                'counters': {name: value / n for name,value in counters.items()}};
+
+    def to_dict(self):
+
+        frames = [];
+
+        for frame in self.frames:
+            frames.append({'start': frame['start'],'duration': frame['duration'],
+                           'sections': [{'name': name,'start': start,'duration': duration,'depth': depth}
+                                        for name,start,duration,depth in frame['sections']],
+                           'counters': dict(frame['counters'])});
+
+        return {'summary': self.get_summary(),'frames': frames};
+
+    def export_json(self,filename):
+
+        with open(filename,'w') as f:
+            json.dump(self.to_dict(),f,indent=1);
+
+    def export_chrome_trace(self,filename):
+        """For chrome://tracing or Perfetto""";
+
+        events = [];
+
+        for i,frame in enumerate(self.frames):
+            events.append({'name': 'frame %d' % i,'ph': 'X','pid': 0,'tid': 0,
+                           'ts': frame['start'] * 1e6,'dur': frame['duration'] * 1e6});
+
+            for name,start,duration,depth in frame['sections']:
+                events.append({'name': name,'ph': 'X','pid': 0,'tid': 0,'ts': start * 1e6,'dur': duration * 1e6});
+
+            events.append({'name': 'counters','ph': 'C','pid': 0,'tid': 0,'ts': frame['start'] * 1e6,
+                           'args': dict(frame['counters'])});
+
+        with open(filename,'w') as f:
+            json.dump({'traceEvents': events,'displayTimeUnit': 'ms'},f);
+
+def _timed(profiler,name,method):
+
+    @functools.wraps(method)
+    def timed(*args,**kwargs):
+
+        profiler.begin(name);
+
+        try:
+            return method(*args,**kwargs);
+        finally:
+            profiler.end();
+
+    return timed;
+
+def _counted(profiler,function_name,counter,function):
+
+    def counted(*args):
+
+        profiler.count(counter);
+
+        #Uploads also count their size
+        if function_name == 'glTexImage2D':
+            profiler.count('bytes_uploaded',args[3] * args[4] * _BYTES_PER_PIXEL.get(args[6],4));
+        elif function_name == 'glBufferData' and args[2] is not None:
+            profiler.count('bytes_uploaded',args[1]);
+        elif function_name == 'glBufferSubData':
+            profiler.count('bytes_uploaded',args[2]);
+
+        return function(*args);
+
+    return counted;
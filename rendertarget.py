@@ -0,0 +1,183 @@
+import weakref
+from OpenGL.GL import *
+from OpenGL.GL.EXT.framebuffer_object import *
+from OpenGL.error import GLError
+
+import glux.texture
+import glux.resources
+
+_BYTES_PER_PIXEL = {GL_RGB: 3, GL_RGBA: 4};
+
+class RenderTargetPool():
+    """Hands out textures with a framebuffer attached, and takes them back to reuse them later""";
+
+    def __init__(self,budget=256*1024*1024):
+
+        self.budget = budget; #In bytes of texture memory
+        self.used_memory = 0;
+
+        #Free targets that go unused for this many frames are deleted, so sizes that were only needed
+        #for a while (like lights moving along the edge of the window) don't pile up
+        self.max_unused_frames = 10;
+        self.frame = 0;
+
+        self.free = {}; #(width,height,format) -> [texture]
+        self.in_use = {}; #id(texture) -> finalizer
+        self.spare_framebuffers = [];
+        self.loose_framebuffer = None;
+
+    def acquire(self,width,height,format=GL_RGB):
+
+        key = (width,height,format);
+
+        if len(self.free.get(key,[])) > 0:
+            texture = self.free[key].pop();
+        else:
+            texture = self._create(width,height,format);
+
+        self.in_use[id(texture)] = weakref.finalize(texture,self._forget,id(texture),
+                                                    texture.framebuffer,texture.memory);
+
+        return texture;
+
+    def release(self,texture):
+        """Gives a texture back; don't use it afterwards, it will be handed out again""";
+
+        finalizer = self.in_use.pop(id(texture),None);
+
+        #Not one of ours, or given back already
+        if finalizer == None:
+            return;
+
+        finalizer.detach();
+        texture.released_frame = self.frame;
+        self.free.setdefault((texture.width,texture.height,texture.format),[]).append(texture);
+
+    def end_frame(self):
+        """Deletes the free targets that weren't used for max_unused_frames""";
+
+        self.frame += 1;
+
+        for key in list(self.free.keys()):
+            textures = self.free[key];
+
+            #The longest unused ones are at the start, as the last one is handed out first
+            while len(textures) > 0 and self.frame - textures[0].released_frame > self.max_unused_frames:
+                self._delete(textures.pop(0));
+
+            if len(textures) == 0:
+                del self.free[key];
+
+    def owns(self,texture):
+
+        return id(texture) in self.in_use;
+
+    def get_framebuffer(self,texture):
+        """The framebuffer that renders into this texture""";
+
+        if self.owns(texture):
+            return texture.framebuffer;
+
+        #Textures from elsewhere share one framebuffer, which is pointed at them when needed
+        if self.loose_framebuffer == None:
+            self.loose_framebuffer = self._create_framebuffer();
+
+        self._attach(self.loose_framebuffer,texture);
+
+        return self.loose_framebuffer;
+
+    def clear(self):
+        """Deletes all textures that are not in use""";
+
+        for textures in self.free.values():
+            for texture in textures:
+                self._delete(texture);
+
+        self.free = {};
+
+        #Framebuffers that aren't attached to anything in use can go as well
+        for framebuffer in self.spare_framebuffers:
+            glux.resources.manager.release('framebuffer',framebuffer);
+
+        self.spare_framebuffers = [];
+
+        if self.loose_framebuffer != None:
+            glux.resources.manager.release('framebuffer',self.loose_framebuffer);
+            self.loose_framebuffer = None;
+
+    def _create(self,width,height,format):
+
+        memory = width * height * _BYTES_PER_PIXEL[format];
+
+        #Make room by throwing away unused targets of other sizes
+        if self.used_memory + memory > self.budget:
+            for key in list(self.free.keys()):
+                while len(self.free[key]) > 0 and self.used_memory + memory > self.budget:
+                    self._delete(self.free[key].pop());
+
+        if self.used_memory + memory > self.budget:
+            raise RenderTargetBudgetError('A %dx%d render target needs %d bytes, but only %d of the %d bytes are left' %
+                                          (width,height,memory,max(0,self.budget - self.used_memory),self.budget));
+
+        try:
+            texture = glux.texture.Texture(None,width=width,height=height);
+
+            if format != GL_RGB:
+                texture.bind();
+                glTexImage2D(GL_TEXTURE_2D,0,format,width,height,0,format,GL_UNSIGNED_BYTE,None);
+                texture.unbind();
+
+        except GLError as e:
+            raise RenderTargetError('Could not create a %dx%d render texture: %s' % (width,height,e));
+
+        texture.format = format;
+        texture.memory = memory;
+
+        if len(self.spare_framebuffers) > 0:
+            texture.framebuffer = self.spare_framebuffers.pop();
+        else:
+            texture.framebuffer = self._create_framebuffer();
+
+        self._attach(texture.framebuffer,texture);
+        self.used_memory += memory;
+
+        return texture;
+
+    def _create_framebuffer(self):
+
+        try:
+            return glux.resources.manager.track('framebuffer',glGenFramebuffersEXT(1),description='Render target framebuffer');
+        except GLError as e:
+            raise RenderTargetError('Could not create a framebuffer: %s' % e);
+
+    def _attach(self,framebuffer,texture):
+
+        previous = glGetIntegerv(GL_FRAMEBUFFER_BINDING_EXT);
+
+        glBindFramebufferEXT(GL_FRAMEBUFFER_EXT,framebuffer);
+        glFramebufferTexture2DEXT(GL_FRAMEBUFFER_EXT,GL_COLOR_ATTACHMENT0_EXT,GL_TEXTURE_2D,texture.tex,0);
+        status = glCheckFramebufferStatusEXT(GL_FRAMEBUFFER_EXT);
+        glBindFramebufferEXT(GL_FRAMEBUFFER_EXT,previous);
+
+        if status != GL_FRAMEBUFFER_COMPLETE_EXT:
+            raise RenderTargetError('Framebuffer for a %dx%d texture is incomplete (status %s)' %
+                                    (texture.width,texture.height,status));
+
+    def _delete(self,texture):
+
+        glux.resources.manager.release('framebuffer',texture.framebuffer);
+        texture.delete();
+        self.used_memory -= texture.memory;
+
+    def _forget(self,texture_id,framebuffer,memory):
+
+        #An acquired texture was garbage collected without being released; keep its framebuffer around
+        del self.in_use[texture_id];
+        self.spare_framebuffers.append(framebuffer);
+        self.used_memory -= memory;
+
+class RenderTargetError(Exception):
+    pass;
+
+class RenderTargetBudgetError(RenderTargetError):
+    pass;
@@ -0,0 +1,130 @@
+import weakref
+import traceback
+import collections
+from OpenGL.GL import *
+from OpenGL.GL.EXT.framebuffer_object import glDeleteFramebuffersEXT
+
+KINDS = ['texture','display_list','framebuffer','buffer','program'];
+
+class ResourceManager():
+    """Keeps track of the OpenGL objects glux makes, and deletes them when that is safe: at the end of a
+    frame (Window.update) or when the window closes. Objects aren't deleted the moment their owner is
+    garbage collected, as that can happen at any time, on any thread, or after the context is gone.
+
+    With trace True, where every object was made is remembered, for the leak report.""";
+
+    def __init__(self):
+
+        self.trace = False;
+        self.live = {kind: {} for kind in KINDS}; #kind -> name -> (description, finalizer, stack)
+        self.pending = []; #(kind, name) to delete at the next collect
+        self.created = collections.Counter();
+        self.deleted = collections.Counter();
+
+    def track(self,kind,name,owner=None,description=None):
+        """Starts tracking an object; with an owner, it is released when the owner is garbage collected""";
+
+        finalizer = None;
+
+        if owner != None:
+            finalizer = weakref.finalize(owner,self.pending.append,(kind,name));
+            finalizer.atexit = False;
+
+        if description == None:
+            description = kind if owner == None else owner.__class__.__name__;
+
+        stack = traceback.format_stack(limit=8)[:-1] if self.trace else None;
+
+        self.live[kind][name] = (description,finalizer,stack);
+        self.created[kind] += 1;
+
+        return name;
+
+    def release(self,kind,name):
+        """The object will be deleted at the next collect; don't use it afterwards""";
+
+        if name not in self.live[kind]:
+            return;
+
+        description, finalizer, stack = self.live[kind][name];
+
+        #If the owner was collected already, the object is waiting to be deleted
+        if finalizer != None:
+            if not finalizer.alive:
+                return;
+
+            finalizer.detach();
+
+        self.pending.append((kind,name));
+
+    def collect(self):
+        """Deletes everything that was released; needs the OpenGL context""";
+
+        while len(self.pending) > 0:
+            kind, name = self.pending.pop();
+
+            if self.live[kind].pop(name,None) == None:
+                continue;
+
+            _delete(kind,name);
+            self.deleted[kind] += 1;
+
+    def get_counts(self):
+        """How many objects of every kind are alive""";
+
+        return {kind: len(self.live[kind]) for kind in KINDS};
+
+    def get_report(self):
+        """The live objects per kind, counted per description (and where they were made, when tracing)""";
+
+        report = {};
+
+        for kind in KINDS:
+            descriptions = collections.Counter();
+
+            for description,finalizer,stack in self.live[kind].values():
+                if stack != None:
+                    description += '\n' + ''.join(stack);
+
+                descriptions[description] += 1;
+
+            if len(descriptions) > 0:
+                report[kind] = dict(descriptions);
+
+        return report;
+
+    def shutdown(self):
+        """Deletes every object before the context goes away, and returns the report of what was still alive""";
+
+        self.collect();
+        leaks = self.get_report();
+
+        for kind in KINDS:
+            for name,(description,finalizer,stack) in self.live[kind].items():
+                if finalizer != None:
+                    finalizer.detach();
+
+                _delete(kind,name);
+                self.deleted[kind] += 1;
+
+            self.live[kind] = {};
+
+        del self.pending[:];
+
+        return leaks;
+
+def _delete(kind,name):
+
+    if kind == 'texture':
+        glDeleteTextures([name]);
+    elif kind == 'display_list':
+        glDeleteLists(name,1);
+    elif kind == 'framebuffer':
+        glDeleteFramebuffersEXT(1,[name]);
+    elif kind == 'buffer':
+        glDeleteBuffers(1,[name]);
+    elif kind == 'program':
+        glDeleteProgram(name);
+
+#Everything glux makes is tracked here
+manager = ResourceManager();
@@ -0,0 +1,331 @@
+import numpy
+from OpenGL.GL import *
+from OpenGL.GL import shaders
+
+import glux.tools
+import glux.light
+import glux.resources
+
+MAX_LIGHTS = 32; #Per pass; more lights take more passes
+
+#How far (0-255) the shader may be from the fixed function path, per light that reaches a pixel
+MAX_DIFFERENCE_PER_LIGHT = 1;
+
+_VERTEX_SHADER = """
+#version 120
+
+void main()
+{
+    gl_Position = gl_ModelViewProjectionMatrix * gl_Vertex;
+}
+""";
+
+#Does per pixel what the fixed function path does per light texture, including rounding to 8 bits
+#after every step. The disks come out the same, but how blending rounds is up to the driver (llvmpipe
+#rounds a product down when it is just over a half), so a pixel can be MAX_DIFFERENCE_PER_LIGHT steps
+#of 1/255 off for every light that reaches it
+_FRAGMENT_SHADER = """
+#version 120
+
+const int MAX_LIGHTS = %(max_lights)d;
+const int MAX_SHADOW_TEXTURES = %(max_shadow_textures)d;
+
+uniform vec2 origin;
+uniform vec2 size;
+uniform vec3 start_color;
+uniform int light_count;
+
+uniform vec2 centers[MAX_LIGHTS];
+uniform vec4 colors[MAX_LIGHTS];
+uniform float radii[MAX_LIGHTS];
+uniform float parts[MAX_LIGHTS];
+uniform vec4 areas[MAX_LIGHTS];
+uniform int slots[MAX_LIGHTS];
+
+uniform sampler2D shadows[MAX_SHADOW_TEXTURES];
+uniform sampler2D mask;
+uniform int use_mask;
+
+vec3 quantize(vec3 color)
+{
+    return floor(color * 255.0 + 0.5) / 255.0;
+}
+
+float quantize(float value)
+{
+    return floor(value * 255.0 + 0.5) / 255.0;
+}
+
+vec3 sample_shadow(int slot, vec2 uv)
+{
+%(shadow_lookup)s
+    return vec3(1.0);
+}
+
+void main()
+{
+    vec2 p = gl_FragCoord.xy + origin;
+    vec3 result = start_color;
+    float white = 0.0;
+
+    if (use_mask == 1)
+        white = texture2D(mask, gl_FragCoord.xy / size).r;
+
+    for (int i = 0; i < MAX_LIGHTS; i++)
+    {
+        if (i >= light_count)
+            break;
+
+        //Only the light's area was drawn
+        vec4 area = areas[i];
+
+        if (p.x < area.x || p.y < area.y || p.x > area.x + area.z || p.y > area.y + area.w)
+            continue;
+
+        //The disk is a triangle fan; the color fades linearly towards its edges
+        vec2 d = p - centers[i];
+        float segment = 360.0 / parts[i];
+        float angle = mod(degrees(atan(d.x, d.y)), 360.0);
+        float from_middle = radians(mod(angle, segment) - segment / 2.0);
+        float t = length(d) * cos(from_middle) / (radii[i] * cos(radians(segment / 2.0)));
+
+        if (t >= 1.0)
+            continue;
+
+        //Blended onto black: fading color times fading alpha, both turned into 8 bits before blending
+        float fade = 1.0 - t;
+        vec3 light = quantize(quantize(colors[i].rgb * fade) * quantize(colors[i].a * fade));
+
+        if (slots[i] >= 0)
+        {
+            vec3 shadow = sample_shadow(slots[i], (p - area.xy) / area.zw);
+
+            if (use_mask == 1)
+                shadow = quantize(white + shadow * (1.0 - white));
+
+            light = quantize(light * shadow);
+        }
+
+        //Screen blending
+        result = quantize(light + result * (1.0 - light));
+    }
+
+    gl_FragColor = vec4(result, 1.0);
+}
+""";
+
+class ShaderLighting():
+    """Lighting engine that does all lights in one fragment shader pass, instead of a texture per light.
+
+    Use it with Window.set_lighting_engine. Lights still render their own shadow layer; the disks,
+    the white shadowcasters and the blending are done by the shader.""";
+
+    def __init__(self,max_shadow_textures=None):
+
+        self.max_shadow_textures = max_shadow_textures;
+        self.program = None;
+        self.passes = 0;
+
+    def _compile(self):
+
+        #One texture unit is for the white shadowcaster mask
+        if self.max_shadow_textures == None:
+            self.max_shadow_textures = min(15,glGetIntegerv(GL_MAX_TEXTURE_IMAGE_UNITS) - 1);
+
+        lookup = [];
+
+        for i in range(self.max_shadow_textures):
+            lookup.append('    if (slot == %d) return texture2D(shadows[%d], uv).rgb;' % (i,i));
+
+        source = _FRAGMENT_SHADER % {'max_lights': MAX_LIGHTS,'max_shadow_textures': self.max_shadow_textures,
+                                     'shadow_lookup': '\n'.join(lookup)};
+
+        try:
+            self.program = shaders.compileProgram(shaders.compileShader(_VERTEX_SHADER,GL_VERTEX_SHADER),
+                                                  shaders.compileShader(source,GL_FRAGMENT_SHADER));
+        except RuntimeError as e:
+            raise ShaderLightingError('Could not compile the lighting shader: %s' % e);
+
+        glux.resources.manager.track('program',self.program,self);
+
+        self.locations = {};
+
+        for name in ['origin','size','start_color','light_count','centers','colors','radii','parts',
+                     'areas','slots','shadows','mask','use_mask']:
+            self.locations[name] = glGetUniformLocation(self.program,name);
+
+    def build(self,window,lights,width,height):
+        """Renders the lighting of the width x height part of the window, and returns the texture""";
+
+        if self.program == None:
+            self._compile();
+
+        #The white shadowcasters are the same for every light, so they are drawn only once
+        mask = None;
+
+        if window.white_shadowcasters != None and any(l.shadows for l in lights):
+            mask = window.render_targets.acquire(width,height);
+            window.change_rendermode('texture',mask);
+            window.fill((0,0,0,0));
+            window.draw_white_shadowcasters();
+            window.change_rendermode('window');
+
+        window.change_rendermode('texture',width=width,height=height);
+        window.flush_batch();
+
+        glUseProgram(self.program);
+        glUniform2f(self.locations['origin'],0,window.height - height);
+        glUniform2f(self.locations['size'],width,height);
+        glUniform1iv(self.locations['shadows'],self.max_shadow_textures,
+                     numpy.arange(1,self.max_shadow_textures+1,dtype=numpy.int32));
+        glUniform1i(self.locations['mask'],0);
+        glUniform1i(self.locations['use_mask'],int(mask != None));
+
+        if mask != None:
+            mask.bind();
+
+        #The first pass replaces everything, starting from the environment color; later passes add to it
+        start_color = [round(c * 255) / 255 for c in window.env_color[:3]];
+        glBlendFunc(GL_ONE,GL_ZERO);
+
+        self.passes = 0;
+
+        for group in self._split(lights):
+            self._draw_pass(window,group,start_color,width,height);
+
+            start_color = (0,0,0);
+            window.change_blendmode('screen');
+
+        #Without any lights there is still the environment color
+        if self.passes == 0:
+            self._draw_pass(window,[],start_color,width,height);
+
+        glUseProgram(0);
+
+        for unit in range(self.max_shadow_textures,-1,-1):
+            glActiveTexture(GL_TEXTURE0 + unit);
+            glBindTexture(GL_TEXTURE_2D,0);
+
+        window.change_blendmode('alpha');
+        window.change_rendermode('window');
+
+        if mask != None:
+            window.render_targets.release(mask);
+
+        return window.render_texture;
+
+    def _split(self,lights):
+        """Groups of lights that fit in one pass""";
+
+        group = [];
+        shadow_textures = 0;
+
+        for light in lights:
+            uses_texture = light.shadow_tex != None;
+
+            if len(group) == MAX_LIGHTS or (uses_texture and shadow_textures == self.max_shadow_textures):
+                yield group;
+                group = [];
+                shadow_textures = 0;
+
+            group.append(light);
+
+            if uses_texture:
+                shadow_textures += 1;
+
+        if len(group) > 0:
+            yield group;
+
+    def _draw_pass(self,window,lights,start_color,width,height):
+
+        n = len(lights);
+
+        centers = numpy.zeros((MAX_LIGHTS,2),dtype=numpy.float32);
+        colors = numpy.zeros((MAX_LIGHTS,4),dtype=numpy.float32);
+        radii = numpy.ones(MAX_LIGHTS,dtype=numpy.float32);
+        parts = numpy.ones(MAX_LIGHTS,dtype=numpy.float32);
+        areas = numpy.zeros((MAX_LIGHTS,4),dtype=numpy.float32);
+        slots = numpy.full(MAX_LIGHTS,-1,dtype=numpy.int32);
+
+        slot = 0;
+
+        for i,light in enumerate(lights):
+            if light.screen_pos == None:
+                raise glux.light.LightNotRenderedError;
+
+            x, y, area_width, area_height = light.area;
+
+            centers[i] = window.translate_coords(light.screen_pos);
+            colors[i] = glux.tools.translate_color(*light.color);
+            radii[i] = light.disk.size;
+            parts[i] = light.disk.parts;
+            areas[i] = (x,window.height - y - area_height,area_width,area_height);
+
+            if light.shadow_tex != None:
+                slots[i] = slot;
+                glActiveTexture(GL_TEXTURE1 + slot);
+                light.shadow_tex.bind();
+                slot += 1;
+
+        glActiveTexture(GL_TEXTURE0);
+
+        glUniform3f(self.locations['start_color'],*start_color);
+        glUniform1i(self.locations['light_count'],n);
+        glUniform2fv(self.locations['centers'],MAX_LIGHTS,centers);
+        glUniform4fv(self.locations['colors'],MAX_LIGHTS,colors);
+        glUniform1fv(self.locations['radii'],MAX_LIGHTS,radii);
+        glUniform1fv(self.locations['parts'],MAX_LIGHTS,parts);
+        glUniform4fv(self.locations['areas'],MAX_LIGHTS,areas);
+        glUniform1iv(self.locations['slots'],MAX_LIGHTS,slots);
+
+        #One quad over the whole target
+        bottom = window.height - height;
+
+        glLoadIdentity();
+        glBegin(GL_QUADS);
+        glVertex2f(0,bottom);
+        glVertex2f(0,bottom + height);
+        glVertex2f(width,bottom + height);
+        glVertex2f(width,bottom);
+        glEnd();
+
+        self.passes += 1;
+
+def compare_lighting(window,lights,positions,engine=None,width=None,height=None):
+    """Renders the lights with the fixed function path and with engine (a ShaderLighting by default),
+    and returns the largest difference of a color channel (0-255) and the number of pixels that differ.
+    The difference stays within MAX_DIFFERENCE_PER_LIGHT times the number of lights that overlap""";
+
+    if engine == None:
+        engine = ShaderLighting();
+
+    previous = window.lighting_engine;
+    images = [];
+
+    for current in [None,engine]:
+        window.set_lighting_engine(current);
+
+        for light,pos in zip(lights,positions):
+            light.render(pos,window,width,height);
+
+        window.build_lighting(lights,[],width,height,key='comparison');
+        images.append(_read_texture(window.light['comparison']));
+
+    window.set_lighting_engine(previous);
+    window.light.release('comparison');
+
+    difference = numpy.abs(images[0].astype(numpy.int16) - images[1].astype(numpy.int16));
+
+    return int(difference.max()), int((difference.max(axis=2) > 0).sum());
+
+def _read_texture(texture):
+
+    texture.bind();
+    pixels = glGetTexImage(GL_TEXTURE_2D,0,GL_RGB,GL_UNSIGNED_BYTE);
+    texture.unbind();
+
+    return numpy.frombuffer(bytes(pixels),dtype=numpy.uint8).reshape(texture.height,texture.width,3);
+
+class ShaderLightingError(Exception):
+    pass;
+
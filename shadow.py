@@ -0,0 +1,286 @@
+import numpy
+from OpenGL.GL import *
+
+import glux.geometry
+import glux.streaming
+
+#Which base corner to use for basepoint1 x, basepoint1 y, basepoint2 x, basepoint2 y,
+#for every combination of horizontal (left,mid,right) and vertical (top,mid,bot) light position.
+#x: 0 = left, 1 = right. y: 0 = base top, 1 = base bottom, 2 = full height
+_BASEPOINT_CHOICES = numpy.array([[1,0,0,1], #left top
+                                  [1,1,0,0], #left mid
+                                  [0,0,1,1], #left bot
+                                  [0,0,1,0], #mid top
+                                  [0,2,1,2], #mid mid
+                                  [0,1,1,1], #mid bot
+                                  [0,0,1,1], #right top
+                                  [1,0,1,1], #right mid
+                                  [1,0,0,1]]); #right bot
+
+#Shadow alpha per quad vertex (basepoint1, topleft, topright, basepoint2)
+_FADING_ALPHAS = numpy.array([0.6,0,0,1],dtype=numpy.float32);
+_SQUARE_ALPHAS = numpy.array([0.6,0.6,0.6,0.6],dtype=numpy.float32);
+_INSIDE_ALPHAS = numpy.array([1,1,1,1],dtype=numpy.float32);
+
+#Which of left, bottom, right, top of the texture's uv each quad vertex uses
+_TEXCOORD_CHOICES = numpy.array([[0,1],[0,3],[2,3],[2,1]]);
+
+#Every quad as two triangles, split the way glBegin(GL_QUADS) does it: (0,1,3) and (1,2,3). Another
+#split spreads the vertex alphas and texture coordinates differently, which warps textured shadows
+_QUAD_TRIANGLES = numpy.array([0,1,3,1,2,3]);
+
+class ShadowBatch():
+    """Keeps the shadowcasters as arrays, so all shadows of a light can be calculated and drawn at once""";
+
+    def __init__(self,shadowcasters):
+
+        self.casters = [];
+        self.positions = [];
+        self._free = [];
+
+        for caster,casterpos in shadowcasters:
+            self.casters.append(caster);
+            self.positions.append(casterpos);
+
+        self._build_arrays();
+
+    def __len__(self):
+
+        return len(self.casters) - len(self._free);
+
+    def _build_arrays(self):
+
+        n = len(self.casters);
+
+        self.pos = numpy.zeros((n,2));
+        self.size = numpy.zeros((n,2));
+        self.longest_side = numpy.zeros(n);
+        self.square = numpy.zeros(n,dtype=bool);
+        self.has_base = numpy.zeros(n,dtype=bool);
+        self.alive = numpy.zeros(n,dtype=bool);
+        self.tex = numpy.zeros(n,dtype=numpy.int64);
+        self.uv = numpy.zeros((n,4));
+
+        #Base as left, right, top, bottom; casters without a base get their full width
+        self.base = numpy.zeros((n,4));
+
+        #The longest side of all living casters; None when it has to be looked up again
+        self._max_longest_side = 0;
+
+        for i,caster in enumerate(self.casters):
+            if caster != None:
+                self._fill_row(i,caster,self.positions[i]);
+
+    def _fill_row(self,i,caster,casterpos):
+
+        self.pos[i] = casterpos;
+        self.size[i] = (caster.width,caster.height);
+        self.longest_side[i] = caster.longest_side;
+        self.square[i] = caster.square_shadow;
+        self.has_base[i] = caster.base != None;
+        self.alive[i] = True;
+        self.tex[i] = caster.tex;
+        self.uv[i] = caster.uv;
+
+        if self._max_longest_side != None:
+            self._max_longest_side = max(self._max_longest_side,caster.longest_side);
+
+        if caster.base == None:
+            self.base[i] = (0,caster.width,0,0);
+        elif caster.square_shadow:
+            self.base[i] = (caster.base.left,caster.base.right,caster.base.top,caster.base.bottom);
+        else:
+            self.base[i] = (0,caster.width,caster.base.top,caster.base.bottom);
+
+    def append(self,caster,casterpos):
+        """Adds a caster and returns its index, which stays the same until it is removed""";
+
+        if len(self._free) > 0:
+            index = self._free.pop();
+            self.casters[index] = caster;
+            self.positions[index] = casterpos;
+            self._fill_row(index,caster,casterpos);
+
+        else:
+            index = len(self.casters);
+            self.casters.append(caster);
+            self.positions.append(casterpos);
+
+            #Grow the arrays with some room to spare
+            if index >= len(self.pos):
+                self._grow(max(16,index * 2));
+
+            self._fill_row(index,caster,casterpos);
+
+        return index;
+
+    def _grow(self,capacity):
+
+        for name in ['pos','size','longest_side','square','has_base','alive','tex','uv','base']:
+            old = getattr(self,name);
+            new = numpy.zeros((capacity,)+old.shape[1:],dtype=old.dtype);
+            new[:len(old)] = old;
+            setattr(self,name,new);
+
+    def remove(self,index):
+
+        self.casters[index] = None;
+        self.positions[index] = None;
+        self.alive[index] = False;
+        self._free.append(index);
+
+        #Only losing the longest caster changes the maximum
+        if self.longest_side[index] == self._max_longest_side:
+            self._max_longest_side = None;
+
+    def move(self,index,casterpos):
+
+        self.positions[index] = casterpos;
+        self.pos[index] = casterpos;
+
+    def get_rect(self,index):
+
+        x, y = self.positions[index];
+        caster = self.casters[index];
+
+        return (x,y,caster.width,caster.height);
+
+    def select(self,light_location,max_distance,candidates=None):
+        """Indices of the casters close enough to cast a shadow""";
+
+        if candidates is None:
+            candidates = numpy.flatnonzero(self.alive);
+        else:
+            candidates = numpy.asarray(candidates,dtype=numpy.int64);
+            candidates = candidates[self.alive[candidates]];
+
+        distances = glux.geometry.distances(light_location,self.pos[candidates] + self.size[candidates] / 2);
+
+        return candidates[distances < max_distance + self.longest_side[candidates]];
+
+    def get_max_longest_side(self):
+
+        if self._max_longest_side == None:
+            if self.alive.any():
+                self._max_longest_side = self.longest_side[self.alive].max();
+            else:
+                self._max_longest_side = 0;
+
+        return self._max_longest_side;
+
+    def get_basepoints(self,light_location,indices,offset=(0,0)):
+        """Array version of glux.light.get_basepoints, for the casters at indices, moved by -offset""";
+
+        lx, ly = light_location;
+
+        x = self.pos[indices,0] - offset[0];
+        y = self.pos[indices,1] - offset[1];
+        width = self.size[indices,0];
+        height = self.size[indices,1];
+        left, right, top, bottom = self.base[indices].T;
+
+        hor = numpy.where(lx < x,0,numpy.where((lx > x) & (lx < x + width),1,2));
+        ver = numpy.where(ly < y + top,0,numpy.where((ly > y + top) & (ly < y + bottom),1,2));
+
+        case = hor * 3 + ver;
+        case[~self.has_base[indices]] = 4;
+
+        choices = _BASEPOINT_CHOICES[case];
+        xs = numpy.stack([left,right],axis=1);
+        ys = numpy.stack([top,bottom,height],axis=1);
+        rows = numpy.arange(len(case));
+
+        basepoint1 = numpy.stack([x + xs[rows,choices[:,0]],y + ys[rows,choices[:,1]]],axis=1);
+        basepoint2 = numpy.stack([x + xs[rows,choices[:,2]],y + ys[rows,choices[:,3]]],axis=1);
+
+        return basepoint1, basepoint2;
+
+    def get_quads(self,light_location,indices,inside,offset=(0,0)):
+        """Basepoints and projected tips of the shadows, in pygame coordinates""";
+
+        basepoint1, basepoint2 = self.get_basepoints(light_location,indices,offset);
+
+        if inside:
+            length = self.size[indices,1] * 10;
+        else:
+            length = self.size[indices,1] * 2;
+
+        topleft = glux.geometry.distances_to_coords_via_points(light_location,length,basepoint1);
+        topright = glux.geometry.distances_to_coords_via_points(light_location,length,basepoint2);
+
+        return basepoint1, basepoint2, topleft, topright;
+
+    def get_vertices(self,window_height,light_location,indices,inside,camera=(0,0)):
+        """The shadow quads as OpenGL coordinates, vertex alphas and texture coordinates, plus
+        which shadows use their caster's texture""";
+
+        #Work in window coordinates; moving everything doesn't change the shadows' shapes
+        camera = numpy.asarray(camera,dtype=numpy.float64);
+        light_location = numpy.asarray(light_location,dtype=numpy.float64) - camera;
+
+        basepoint1, basepoint2, topleft, topright = self.get_quads(light_location,indices,inside,camera);
+
+        #Placed the way Texture.draw_shadow does it: relative to the translated caster position
+        dest = (self.pos[indices] - camera) * (1,-1) + (0,window_height) - (0,1) * self.size[indices];
+
+        corners = numpy.stack([basepoint1,topleft,topright,basepoint2],axis=1);
+        vertices = numpy.empty(corners.shape,dtype=numpy.float32);
+        vertices[:,:,0] = corners[:,:,0] + dest[:,None,0];
+        vertices[:,:,1] = window_height - corners[:,:,1] + dest[:,None,1];
+
+        square = self.square[indices];
+
+        if inside:
+            alphas = numpy.tile(_INSIDE_ALPHAS,(len(indices),1));
+        else:
+            alphas = numpy.where(square[:,None],_SQUARE_ALPHAS,_FADING_ALPHAS);
+
+        texcoords = self.uv[indices][:,_TEXCOORD_CHOICES].astype(numpy.float32);
+
+        return vertices, alphas, texcoords, ~square;
+
+    def draw(self,window,light_location,indices):
+
+        if len(indices) == 0:
+            return;
+
+        vertices, alphas, texcoords, textured = self.get_vertices(window.height,light_location,indices,window.inside,
+                                                                  window.get_camera_offset());
+
+        colors = numpy.zeros((len(indices),4,4),dtype=numpy.float32);
+        colors[:,:,3] = alphas;
+
+        #Square shadows first, then textured ones grouped per texture; black shadows blend in any order
+        tex = numpy.where(textured,self.tex[indices],0);
+        order = numpy.argsort(tex,kind='stable');
+        tex = tex[order];
+
+        vertices = numpy.ascontiguousarray(vertices[order][:,_QUAD_TRIANGLES].reshape(-1,2));
+        colors = numpy.ascontiguousarray(colors[order][:,_QUAD_TRIANGLES].reshape(-1,4));
+        texcoords = numpy.ascontiguousarray(texcoords[order][:,_QUAD_TRIANGLES].reshape(-1,2));
+
+        glLoadIdentity();
+
+        glEnableClientState(GL_VERTEX_ARRAY);
+        glEnableClientState(GL_COLOR_ARRAY);
+        glEnableClientState(GL_TEXTURE_COORD_ARRAY);
+
+        stream = glux.streaming.get_stream_buffer();
+        vertex_offset, color_offset, texcoord_offset = stream.write(vertices,colors,texcoords);
+
+        glVertexPointer(2,GL_FLOAT,0,vertex_offset);
+        glColorPointer(4,GL_FLOAT,0,color_offset);
+        glTexCoordPointer(2,GL_FLOAT,0,texcoord_offset);
+
+        #One draw call per texture
+        starts = numpy.flatnonzero(numpy.r_[True,tex[1:] != tex[:-1]]);
+        ends = numpy.r_[starts[1:],len(tex)];
+
+        for start,end in zip(starts,ends):
+            glBindTexture(GL_TEXTURE_2D,int(tex[start]));
+            glDrawArrays(GL_TRIANGLES,int(start) * 6,int(end - start) * 6);
+
+        stream.unbind();
+        glDisableClientState(GL_TEXTURE_COORD_ARRAY);
+        glDisableClientState(GL_COLOR_ARRAY);
+        glDisableClientState(GL_VERTEX_ARRAY);
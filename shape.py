@@ -1,8 +1,23 @@
+import ctypes
+import numpy
 from OpenGL.GL import *
 from OpenGL.GLU import *
 
 import glux.tools
 import glux.geometry
+import glux.resources
+import glux.streaming
+
+#Vertex buffers of disks, shared by disks with the same size, parts and colors
+_disk_buffers = {};
+
+def clear_disk_buffers():
+    """Frees the shared vertex buffers; disks make them again when they are drawn""";
+
+    for buffer,color_offset in _disk_buffers.values():
+        glux.resources.manager.release('buffer',buffer);
+
+    _disk_buffers.clear();
 
 class Disk():
 
@@ -22,39 +37,101 @@ class Disk():
 
         self.parts = parts;
 
+    def get_rim(self):
+        """The vertices around the center, relative to the center""";
+
+        degrees_per_part = 360 / self.parts;
+        degrees = numpy.arange(self.parts+1) * degrees_per_part;
+
+        return glux.geometry.angles_to_locs((0,0),degrees,self.size);
+
+    def _get_buffer(self):
+
+        key = (self.size,self.parts,self.color1,self.color2);
+
+        if key not in _disk_buffers:
+
+            #The center, then the vertices around it; all positions first, then all colors
+            vertices = numpy.zeros((self.parts+2,2),dtype=numpy.float32);
+            vertices[1:] = self.get_rim();
+
+            colors = numpy.empty((self.parts+2,4),dtype=numpy.float32);
+            colors[0] = self.color1;
+            colors[1:] = self.color2;
+
+            data = numpy.concatenate([vertices.ravel(),colors.ravel()]);
+
+            buffer = glux.resources.manager.track('buffer',glGenBuffers(1),description='Disk buffer');
+            glBindBuffer(GL_ARRAY_BUFFER,buffer);
+            glBufferData(GL_ARRAY_BUFFER,data.nbytes,data,GL_STATIC_DRAW);
+            glBindBuffer(GL_ARRAY_BUFFER,0);
+
+            _disk_buffers[key] = (buffer,vertices.nbytes);
+
+        return _disk_buffers[key];
+
     def draw(self,pos,rotation=None):
 
         #Unbind previous textures
         glBindTexture(GL_TEXTURE_2D, 0);
 
-        #Reset the position
-        glLoadIdentity()
+        #Travel to the center
+        glLoadIdentity();
+        glTranslate(pos[0],pos[1],0);
 
-        #Start drawing the disk
-        glBegin(GL_TRIANGLE_FAN)
+        buffer, color_offset = self._get_buffer();
 
-        #Start the with center
-        basex,basey = pos;
+        glBindBuffer(GL_ARRAY_BUFFER,buffer);
+        glEnableClientState(GL_VERTEX_ARRAY);
+        glEnableClientState(GL_COLOR_ARRAY);
 
-        glColor4fv(self.color1);
-        glVertex2f(basex,basey)
+        glVertexPointer(2,GL_FLOAT,0,ctypes.c_void_p(0));
+        glColorPointer(4,GL_FLOAT,0,ctypes.c_void_p(color_offset));
+        glDrawArrays(GL_TRIANGLE_FAN,0,self.parts+2);
 
-        #Then the vertices around the center
-        glColor4fv(self.color2);
+        glDisableClientState(GL_COLOR_ARRAY);
+        glDisableClientState(GL_VERTEX_ARRAY);
+        glBindBuffer(GL_ARRAY_BUFFER,0);
 
-        degrees_per_part = 360 / self.parts;
+        glLoadIdentity();
+
+    def draw_many(self,positions):
+        """Draws the disk at all positions (OpenGL coordinates) with one draw call""";
+
+        positions = numpy.asarray(positions,dtype=numpy.float32).reshape(-1,2);
+
+        if len(positions) == 0:
+            return;
+
+        #The fan as separate triangles: center, rim vertex, next rim vertex
+        rim = self.get_rim().astype(numpy.float32);
+        triangles = numpy.zeros((self.parts,3,2),dtype=numpy.float32);
+        triangles[:,1] = rim[:-1];
+        triangles[:,2] = rim[1:];
+
+        vertices = (positions[:,None,None,:] + triangles[None]).reshape(-1,2);
+
+        colors = numpy.empty((self.parts,3,4),dtype=numpy.float32);
+        colors[:,0] = self.color1;
+        colors[:,1:] = self.color2;
+        colors = numpy.tile(colors.reshape(-1,4),(len(positions),1));
+
+        glBindTexture(GL_TEXTURE_2D, 0);
+        glLoadIdentity();
+
+        glEnableClientState(GL_VERTEX_ARRAY);
+        glEnableClientState(GL_COLOR_ARRAY);
 
-        for i in range(self.parts+1):
-            #Use some math to determine their location
-            degrees = degrees_per_part * i;
-            loc = glux.geometry.angle_to_loc((basex,basey),degrees,self.size);
+        stream = glux.streaming.get_stream_buffer();
+        vertex_offset, color_offset = stream.write(vertices,colors);
 
-            glVertex2f(*loc);
+        glVertexPointer(2,GL_FLOAT,0,vertex_offset);
+        glColorPointer(4,GL_FLOAT,0,color_offset);
+        glDrawArrays(GL_TRIANGLES,0,len(vertices));
+        stream.unbind();
 
-        try:
-            glEnd();
-        except:
-            print('Error drawing circle');
+        glDisableClientState(GL_COLOR_ARRAY);
+        glDisableClientState(GL_VERTEX_ARRAY);
 
 
 class Line():
@@ -75,12 +152,12 @@ class Line():
         glColor4fv(self.color);
         glLineWidth(self.size);
 
-        glBegin(GL_LINES);
-        glVertex2d(*c1);
-        glVertex2d(*c2);
+        stream = glux.streaming.get_stream_buffer();
+        vertex_offset, = stream.write(numpy.array([c1,c2],dtype=numpy.float32));
 
-        try:
-            glEnd();
-        except:
-            print('Error drawing line');
+        glEnableClientState(GL_VERTEX_ARRAY);
+        glVertexPointer(2,GL_FLOAT,0,vertex_offset);
+        glDrawArrays(GL_LINES,0,2);
+        stream.unbind();
+        glDisableClientState(GL_VERTEX_ARRAY);
 
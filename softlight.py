@@ -0,0 +1,291 @@
+import concurrent.futures
+import numpy
+import pygame as p
+from OpenGL.GL import glGetTexImage, GL_TEXTURE_2D, GL_RGBA, GL_UNSIGNED_BYTE
+
+import glux.texture
+import glux.tools
+import glux.light
+import glux.shadow
+
+class SoftwareCaster():
+    """A shadowcaster for SoftwareLighting: the size, base and alpha of an image, without OpenGL""";
+
+    #What ShadowBatch expects of a caster
+    tex = 0;
+    uv = (0,0,1,1);
+
+    def __init__(self,source,base=None,square_shadow=False,colorkey=None,transparent=True):
+        """Source is a filename or a pygame Surface""";
+
+        if isinstance(source,str):
+            pixels, width, height = glux.texture.decode_image(source,colorkey,transparent);
+        else:
+            if colorkey != None:
+                source.set_colorkey(colorkey);
+
+            pixels = p.image.tostring(source,'RGBA',1);
+            width, height = source.get_size();
+
+        self._set_pixels(pixels,width,height,base,square_shadow);
+
+    @classmethod
+    def from_texture(cls,texture):
+        """Needs an OpenGL context, to read the texture back""";
+
+        caster = cls.__new__(cls);
+        texture.bind();
+        pixels = glGetTexImage(GL_TEXTURE_2D,0,GL_RGBA,GL_UNSIGNED_BYTE);
+        caster._set_pixels(bytes(pixels),texture.width,texture.height,texture.base,texture.square_shadow);
+
+        return caster;
+
+    def _set_pixels(self,pixels,width,height,base,square_shadow):
+
+        self.width = width;
+        self.height = height;
+        self.longest_side = max(width,height);
+        self.square_shadow = square_shadow;
+
+        if base == None:
+            self.base = None;
+        else:
+            self.base = p.Rect(*base);
+
+        #Flipped like texture data: the first row is the bottom one
+        self.alpha = numpy.frombuffer(pixels,dtype=numpy.uint8).reshape(height,width,4)[:,:,3] / 255;
+
+class SoftwareLighting():
+    """Calculates the same lighting as Window.build_lighting, with NumPy instead of OpenGL.
+
+    Positions are window coordinates. With processes, every light is done in a process of its own.""";
+
+    def __init__(self,width,height,shadowcasters=None,environment_color=False,inside=False,processes=None):
+
+        self.width = width;
+        self.height = height;
+        self.inside = inside;
+
+        if not environment_color:
+            self.env_color = (0,0,0,0);
+        else:
+            self.env_color = glux.tools.translate_color(*environment_color);
+
+        self.processes = processes;
+        self._pool = None;
+
+        if shadowcasters == None:
+            shadowcasters = [];
+
+        self.set_shadowcasters(shadowcasters);
+
+    def set_shadowcasters(self,shadowcasters):
+        """A list of (SoftwareCaster,position)""";
+
+        self.shadowbatch = glux.shadow.ShadowBatch(shadowcasters);
+
+        #Every visible pixel of a caster is lit as if there were no shadows; rows from the bottom, like OpenGL
+        self.white_shadowcasters = numpy.zeros((self.height,self.width),dtype=bool);
+
+        for caster,(x,y) in shadowcasters:
+            bottom = self.height - y - caster.height;
+            row_start, row_stop = max(0,bottom), min(self.height,bottom + caster.height);
+            column_start, column_stop = max(0,x), min(self.width,x + caster.width);
+
+            #Casters outside the window have nothing to light
+            if row_start >= row_stop or column_start >= column_stop:
+                continue;
+
+            visible = caster.alpha[row_start - bottom:row_stop - bottom,column_start - x:column_stop - x] > 0;
+            self.white_shadowcasters[row_start:row_stop,column_start:column_stop] |= visible;
+
+        #Workers have a copy of the casters
+        self.shutdown();
+
+    def build(self,lights,positions):
+        """The lighting as RGB bytes in an array of height x width x 3, top row first""";
+
+        jobs = [];
+
+        for light,pos in zip(lights,positions):
+            area = glux.light.Light.get_area(light,pos,self.width,self.height);
+            jobs.append((tuple(light.color),light.strength,light.shadows,light.visibility_distance,
+                         light.disk.parts,tuple(pos),area));
+
+        if self.processes == None:
+            results = [_render_light(self,job) for job in jobs];
+        else:
+            if self._pool == None:
+                self._pool = concurrent.futures.ProcessPoolExecutor(self.processes,initializer=_start_worker,
+                                                                    initargs=(self,));
+            results = self._pool.map(_render_light_in_worker,jobs);
+
+        #Screen blend every light onto the environment color, in 8 bits like a texture
+        result = numpy.empty((self.height,self.width,3));
+        result[:] = _quantize(numpy.asarray(self.env_color[:3]));
+
+        for (left,bottom,width,height),light in results:
+            part = result[bottom:bottom+height,left:left+width];
+            part[:] = _quantize(light + part * (1 - light));
+
+        return numpy.round(result[::-1] * 255).astype(numpy.uint8);
+
+    def __getstate__(self):
+
+        #What the worker processes get: everything but the pool itself
+        state = dict(self.__dict__);
+        state['_pool'] = None;
+
+        return state;
+
+    def shutdown(self):
+
+        if self._pool != None:
+            self._pool.shutdown();
+            self._pool = None;
+
+_worker_lighting = None;
+
+def _start_worker(lighting):
+
+    global _worker_lighting;
+    _worker_lighting = lighting;
+
+def _render_light_in_worker(job):
+
+    return _render_light(_worker_lighting,job);
+
+def _render_light(lighting,job):
+    """The light's area in OpenGL coordinates, and what it adds there, like Light.render""";
+
+    color, strength, shadows, visibility_distance, parts, pos, area = job;
+    x, y, area_width, area_height = area;
+    bottom = lighting.height - y - area_height;
+
+    #Pixel centers of the area, in OpenGL coordinates
+    gl_x = x + numpy.arange(area_width) + 0.5;
+    gl_y = bottom + numpy.arange(area_height) + 0.5;
+    grid_x, grid_y = numpy.meshgrid(gl_x,gl_y);
+
+    #The disk: a triangle fan whose color and alpha fade towards the edge, blended onto black
+    dx = grid_x - pos[0];
+    dy = grid_y - (lighting.height - pos[1]);
+    segment = 360 / parts;
+    angle = numpy.degrees(numpy.arctan2(dx,dy)) % 360;
+    from_middle = numpy.radians(angle % segment - segment / 2);
+    t = numpy.hypot(dx,dy) * numpy.cos(from_middle) / (strength * numpy.cos(numpy.radians(segment / 2)));
+    fade = numpy.clip(1 - t,0,None);
+
+    #Color and alpha are turned into 8 bits before blending, like OpenGL does
+    r, g, b, a = glux.tools.translate_color(*color);
+    light = _quantize(_quantize(numpy.stack([r * fade,g * fade,b * fade],axis=-1)) * _quantize(a * fade)[:,:,None]);
+
+    if shadows:
+        layer = numpy.ones((area_height,area_width));
+
+        batch = lighting.shadowbatch;
+        indices = batch.select(pos,visibility_distance);
+
+        if len(indices) > 0:
+            vertices, alphas, texcoords, textured = batch.get_vertices(lighting.height,pos,indices,lighting.inside);
+
+            for i,index in enumerate(indices):
+                texture = batch.casters[index].alpha if textured[i] else None;
+                _draw_shadow_quad(layer,x,bottom,vertices[i],alphas[i],texcoords[i],texture);
+
+        #The casters themselves are lit
+        layer[lighting.white_shadowcasters[bottom:bottom+area_height,x:x+area_width]] = 1;
+
+        light = _quantize(light * layer[:,:,None]);
+
+    return (x,bottom,area_width,area_height), light;
+
+def _draw_shadow_quad(layer,left,bottom,vertices,alphas,texcoords,texture):
+
+    #OpenGL splits a quad into these two triangles
+    for corners in [(0,1,3),(1,2,3)]:
+        corners = list(corners);
+        _draw_shadow_triangle(layer,left,bottom,vertices[corners],alphas[corners],texcoords[corners],texture);
+
+def _draw_shadow_triangle(layer,left,bottom,vertices,alphas,texcoords,texture):
+
+    height, width = layer.shape;
+
+    #Only look at the pixels within the triangle's bounding box
+    x0 = max(0,int(numpy.floor(vertices[:,0].min() - left)));
+    x1 = min(width,int(numpy.ceil(vertices[:,0].max() - left)) + 1);
+    y0 = max(0,int(numpy.floor(vertices[:,1].min() - bottom)));
+    y1 = min(height,int(numpy.ceil(vertices[:,1].max() - bottom)) + 1);
+
+    if x0 >= x1 or y0 >= y1:
+        return;
+
+    (ax,ay), (bx,by), (cx,cy) = vertices.astype(numpy.float64);
+    area = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax);
+
+    if area == 0:
+        return;
+
+    px, py = numpy.meshgrid(left + numpy.arange(x0,x1) + 0.5,bottom + numpy.arange(y0,y1) + 0.5);
+
+    #Barycentric weights of every pixel center
+    weight_a = ((bx - px) * (cy - py) - (by - py) * (cx - px)) / area;
+    weight_b = ((cx - px) * (ay - py) - (cy - py) * (ax - px)) / area;
+    weight_c = ((ax - px) * (by - py) - (ay - py) * (bx - px)) / area;
+
+    inside = numpy.ones(px.shape,dtype=bool);
+
+    for weight,start,end in [(weight_a,(bx,by),(cx,cy)),(weight_b,(cx,cy),(ax,ay)),(weight_c,(ax,ay),(bx,by))]:
+        if _owns_edge(start,end,area):
+            inside &= weight >= 0;
+        else:
+            inside &= weight > 0;
+
+    alpha = weight_a * alphas[0] + weight_b * alphas[1] + weight_c * alphas[2];
+
+    if texture is not None:
+        u = weight_a * texcoords[0,0] + weight_b * texcoords[1,0] + weight_c * texcoords[2,0];
+        v = weight_a * texcoords[0,1] + weight_b * texcoords[1,1] + weight_c * texcoords[2,1];
+        alpha = alpha * _sample(texture,u,v);
+
+    #Black with this alpha, blended onto the layer
+    part = layer[y0:y1,x0:x1];
+    part[inside] = _quantize(part[inside] * (1 - alpha[inside]));
+
+def _owns_edge(start,end,area):
+    """Whether pixel centers right on the edge from start to end are the triangle's. Like OpenGL, only
+    left and top edges are, so a pixel on the edge between two triangles is drawn once""";
+
+    dx = end[0] - start[0];
+    dy = end[1] - start[1];
+
+    #Go around counterclockwise; y goes up, so the inside is on the left
+    if area < 0:
+        dx, dy = -dx, -dy;
+
+    return dy < 0 or (dy == 0 and dx < 0);
+
+def _sample(texture,u,v):
+    """Linear filtering with repeat wrapping, like the textures glux makes""";
+
+    height, width = texture.shape;
+
+    s = u * width - 0.5;
+    t = v * height - 0.5;
+    s0 = numpy.floor(s);
+    t0 = numpy.floor(t);
+    fs = s - s0;
+    ft = t - t0;
+
+    s0 = s0.astype(numpy.int64) % width;
+    t0 = t0.astype(numpy.int64) % height;
+    s1 = (s0 + 1) % width;
+    t1 = (t0 + 1) % height;
+
+    return (texture[t0,s0] * (1 - fs) * (1 - ft) + texture[t0,s1] * fs * (1 - ft) +
+            texture[t1,s0] * (1 - fs) * ft + texture[t1,s1] * fs * ft);
+
+def _quantize(values):
+    """Rounds to what an 8 bit texture can hold""";
+
+    return numpy.floor(values * 255 + 0.5) / 255;
@@ -0,0 +1,100 @@
+import math
+
+class SpatialGrid():
+    """Uniform grid of rectangles, so you can ask which ones are near a point without checking all of them""";
+
+    def __init__(self,cell_size=128):
+
+        self.cell_size = cell_size;
+        self.cells = {};
+        self.rects = {};
+
+    def __len__(self):
+
+        return len(self.rects);
+
+    def __contains__(self,key):
+
+        return key in self.rects;
+
+    def _cells_for(self,left,top,right,bottom):
+
+        first_x = math.floor(left / self.cell_size);
+        first_y = math.floor(top / self.cell_size);
+        last_x = math.floor(right / self.cell_size);
+        last_y = math.floor(bottom / self.cell_size);
+
+        for x in range(first_x,last_x+1):
+            for y in range(first_y,last_y+1):
+                yield (x,y);
+
+    def insert(self,key,rect):
+        """Rect is (x,y,width,height) in pygame coordinates""";
+
+        if key in self.rects:
+            self.remove(key);
+
+        x, y, width, height = rect;
+        self.rects[key] = (x,y,width,height);
+
+        for cell in self._cells_for(x,y,x+width,y+height):
+            self.cells.setdefault(cell,set()).add(key);
+
+    def remove(self,key):
+
+        x, y, width, height = self.rects.pop(key);
+
+        for cell in self._cells_for(x,y,x+width,y+height):
+            keys = self.cells[cell];
+            keys.discard(key);
+
+            if len(keys) == 0:
+                del self.cells[cell];
+
+    def move(self,key,pos):
+
+        x, y, width, height = self.rects[key];
+
+        #Only touch the cells if the rect ends up in other ones
+        old_cells = list(self._cells_for(x,y,x+width,y+height));
+        new_cells = list(self._cells_for(pos[0],pos[1],pos[0]+width,pos[1]+height));
+
+        self.rects[key] = (pos[0],pos[1],width,height);
+
+        if old_cells == new_cells:
+            return;
+
+        for cell in old_cells:
+            keys = self.cells[cell];
+            keys.discard(key);
+
+            if len(keys) == 0:
+                del self.cells[cell];
+
+        for cell in new_cells:
+            self.cells.setdefault(cell,set()).add(key);
+
+    def query_rect(self,rect):
+        """All keys whose rect overlaps the given (x,y,width,height) rect""";
+
+        x, y, width, height = rect;
+        found = set();
+
+        for cell in self._cells_for(x,y,x+width,y+height):
+            if cell in self.cells:
+                found.update(self.cells[cell]);
+
+        result = [];
+
+        for key in found:
+            kx, ky, kwidth, kheight = self.rects[key];
+
+            if kx <= x + width and kx + kwidth >= x and ky <= y + height and ky + kheight >= y:
+                result.append(key);
+
+        return result;
+
+    def query_radius(self,center,radius):
+        """All keys whose rect overlaps the square around center; a cheap superset of the circle""";
+
+        return self.query_rect((center[0]-radius,center[1]-radius,radius*2,radius*2));
@@ -0,0 +1,187 @@
+import ctypes
+import numpy
+from OpenGL.GL import *
+from OpenGL.GL.ARB.buffer_storage import glInitBufferStorageARB
+
+import glux.resources
+
+_ALIGNMENT = 16;
+
+class StreamBuffer():
+    """One vertex buffer that all dynamic geometry is written into, round and round like a ring.
+
+    Where GL_ARB_buffer_storage is available, the buffer is mapped once and stays mapped: writing is
+    copying into a NumPy view of it, without any OpenGL call. The ring is split in segments with a fence
+    each, so a segment is only written again once the GPU is done drawing from it. Without buffer
+    storage, the data is uploaded with glBufferSubData, and the buffer is orphaned every time the ring
+    starts over, so the driver gives fresh memory instead of waiting.""";
+
+    def __init__(self,size=4*1024*1024,segments=4,persistent=None):
+
+        if persistent == None:
+            persistent = bool(glInitBufferStorageARB());
+
+        self.persistent = persistent;
+        self.segments = segments;
+
+        self.buffer = None;
+        self.view = None;
+        self.fences = [];
+        self.offset = 0;
+        self.segment = 0;
+
+        #For finding stalls: how often we had to wait for the GPU, and how often the buffer was orphaned
+        self.waits = 0;
+        self.orphans = 0;
+        self.bytes_written = 0;
+
+        self._create(size);
+
+    def _create(self,size):
+
+        self.delete();
+
+        self.size = size;
+        self.segment_size = size // self.segments;
+        self.buffer = glux.resources.manager.track('buffer',glGenBuffers(1),description='Stream buffer');
+        glBindBuffer(GL_ARRAY_BUFFER,self.buffer);
+
+        if self.persistent:
+            flags = GL_MAP_WRITE_BIT | GL_MAP_PERSISTENT_BIT | GL_MAP_COHERENT_BIT;
+            glBufferStorage(GL_ARRAY_BUFFER,size,None,flags);
+            pointer = glMapBufferRange(GL_ARRAY_BUFFER,0,size,flags);
+            self.view = numpy.frombuffer((ctypes.c_ubyte * size).from_address(pointer),dtype=numpy.uint8);
+        else:
+            glBufferData(GL_ARRAY_BUFFER,size,None,GL_STREAM_DRAW);
+
+        glBindBuffer(GL_ARRAY_BUFFER,0);
+
+        self.fences = [None] * self.segments;
+        self.offset = 0;
+        self.segment = 0;
+
+    def write(self,*arrays):
+        """Copies the arrays into the buffer and binds it; returns where each one starts, for gl*Pointer.
+        Unbind it again before using client arrays.""";
+
+        arrays = [numpy.ascontiguousarray(array) for array in arrays];
+        sizes = [_align(array.nbytes) for array in arrays];
+        total = sum(sizes);
+
+        #Too big for the ring: start over with a bigger one
+        if total > self.segment_size:
+            self._create(max(self.size * 2,_align(total) * self.segments));
+
+        start = self._allocate(total);
+        offsets = [];
+
+        glBindBuffer(GL_ARRAY_BUFFER,self.buffer);
+
+        for array,size in zip(arrays,sizes):
+            data = array.view(numpy.uint8).ravel();
+
+            if self.persistent:
+                self.view[start:start+len(data)] = data;
+            else:
+                glBufferSubData(GL_ARRAY_BUFFER,start,len(data),data);
+
+            offsets.append(ctypes.c_void_p(start));
+            start += size;
+
+        self.bytes_written += total;
+
+        return offsets;
+
+    def unbind(self):
+
+        glBindBuffer(GL_ARRAY_BUFFER,0);
+
+    def _allocate(self,size):
+
+        #Allocations don't wrap around the end, so start over at the beginning
+        if self.offset + size > self.size:
+            self._enter_segment(0);
+            self.offset = 0;
+
+            if not self.persistent:
+                glBindBuffer(GL_ARRAY_BUFFER,self.buffer);
+                glBufferData(GL_ARRAY_BUFFER,self.size,None,GL_STREAM_DRAW);
+                self.orphans += 1;
+
+        end = self.offset + size;
+
+        while end > (self.segment + 1) * self.segment_size:
+            self._enter_segment(self.segment + 1);
+
+        start = self.offset;
+        self.offset = end;
+
+        return start;
+
+    def _enter_segment(self,segment):
+
+        if not self.persistent:
+            self.segment = segment;
+            return;
+
+        #Everything drawn from the segment we leave has been issued by now
+        self.fences[self.segment] = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE,0);
+        self.segment = segment;
+
+        #The GPU has to be done with what was in the new segment the last time around
+        fence = self.fences[segment];
+
+        if fence != None:
+            if glClientWaitSync(fence,0,0) == GL_TIMEOUT_EXPIRED:
+                self.waits += 1;
+
+                while glClientWaitSync(fence,GL_SYNC_FLUSH_COMMANDS_BIT,1000000) == GL_TIMEOUT_EXPIRED:
+                    pass;
+
+            glDeleteSync(fence);
+            self.fences[segment] = None;
+
+    def delete(self):
+
+        for fence in self.fences:
+            if fence != None:
+                glDeleteSync(fence);
+
+        self.fences = [];
+
+        if self.buffer != None:
+
+            #A persistent mapping has to go before the buffer does
+            if self.persistent:
+                glBindBuffer(GL_ARRAY_BUFFER,self.buffer);
+                glUnmapBuffer(GL_ARRAY_BUFFER);
+                glBindBuffer(GL_ARRAY_BUFFER,0);
+                self.view = None;
+
+            glux.resources.manager.release('buffer',self.buffer);
+            self.buffer = None;
+
+def _align(size):
+
+    return (size + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT;
+
+#Shared by everything that draws dynamic geometry
+_stream_buffer = None;
+
+def get_stream_buffer():
+
+    global _stream_buffer;
+
+    if _stream_buffer == None:
+        _stream_buffer = StreamBuffer();
+
+    return _stream_buffer;
+
+def clear_stream_buffer():
+    """Frees the shared stream buffer; it is made again when something is drawn""";
+
+    global _stream_buffer;
+
+    if _stream_buffer != None:
+        _stream_buffer.delete();
+        _stream_buffer = None;
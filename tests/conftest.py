@@ -0,0 +1,56 @@
+import os
+import sys
+import platform
+import importlib.util
+
+import pytest
+
+#Without a display, OpenGL tests use an offscreen context (like python -m glux.benchmark does)
+if platform.system() == 'Linux' and 'DISPLAY' not in os.environ and 'WAYLAND_DISPLAY' not in os.environ:
+    os.environ.setdefault('SDL_VIDEODRIVER','offscreen');
+    os.environ.setdefault('PYOPENGL_PLATFORM','egl');
+
+#The repository is the glux package itself; make it importable under that name
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)));
+
+if 'glux' not in sys.modules:
+    _spec = importlib.util.spec_from_file_location('glux',os.path.join(_ROOT,'__init__.py'),
+                                                   submodule_search_locations=[_ROOT]);
+    _module = importlib.util.module_from_spec(_spec);
+    sys.modules['glux'] = _module;
+    _spec.loader.exec_module(_module);
+
+import glux
+
+@pytest.fixture(scope='session')
+def window():
+    """A 320x240 window, for tests that need an OpenGL context; skipped if there is none""";
+
+    import pygame as p
+
+    try:
+        p.init();
+        window = glux.Window();
+        window.start(320,240,'glux tests');
+    except Exception as e:
+        pytest.skip('No OpenGL context: %s' % e);
+
+    yield window;
+
+    window.close();
+
+@pytest.fixture
+def clean_window(window):
+    """The window without shadowcasters, lighting engine, camera, environment color or batching left over
+    from other tests""";
+
+    window.set_shadowcasters([]);
+    window.env_color = (0,0,0,0);
+    window.set_lighting_engine(None);
+    window.set_camera(None);
+    window.inside = False;
+
+    yield window;
+
+    if window.batch != None:
+        window.end_batch();
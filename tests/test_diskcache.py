@@ -0,0 +1,46 @@
+import threading
+
+import glux.diskcache
+
+def test_storing_the_same_entry_from_many_threads(tmp_path):
+
+    cache = glux.diskcache.TextureCache(str(tmp_path));
+    pixels = bytes(range(256)) * 4;
+    white_pixels = bytes([255]) * 1024;
+    errors = [];
+
+    def store():
+
+        try:
+            for i in range(20):
+                cache.store('same',pixels,16,16,white_pixels);
+        except Exception as e:
+            errors.append(e);
+
+    threads = [threading.Thread(target=store) for i in range(8)];
+
+    for thread in threads:
+        thread.start();
+
+    for thread in threads:
+        thread.join();
+
+    assert errors == [];
+
+    loaded_pixels, width, height, loaded_white_pixels = cache.load('same');
+
+    assert bytes(loaded_pixels) == pixels and bytes(loaded_white_pixels) == white_pixels;
+    assert (width,height) == (16,16);
+
+    #No temporary files are left behind
+    assert sorted(f.name for f in tmp_path.iterdir()) == ['same.json','same.rgba','same.white'];
+
+def test_loaded_entries_are_bytes(tmp_path):
+
+    cache = glux.diskcache.TextureCache(str(tmp_path));
+    cache.store('key',bytes(64),4,4,bytes(16));
+
+    pixels, width, height, white_pixels = cache.load('key');
+
+    #Not views of memory maps, so they can be kept around and pickled
+    assert type(pixels) == bytes and type(white_pixels) == bytes;
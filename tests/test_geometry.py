@@ -0,0 +1,110 @@
+import math
+import random
+
+import numpy
+import pytest
+
+import glux.geometry as geometry
+
+#Seeded random sampling: the same cases every run
+_RNG = random.Random(15);
+
+def _point(rng):
+
+    return (rng.uniform(-1000,1000),rng.uniform(-1000,1000));
+
+_RANDOM_PAIRS = [(_point(_RNG),_point(_RNG)) for i in range(2000)];
+
+#Identical points, negative coordinates, and points right of, above and below each other;
+#straight left is left out, see test_coords_to_angles_straight_lines
+_EDGE_PAIRS = [((0,0),(0,0)),((-5,-5),(-5,-5)),((3.5,-2),(3.5,-2)),
+               ((0,0),(10,0)),((-10,-3),(-1,-3)),
+               ((0,0),(10,10)),((0,0),(-10,10)),((0,0),(-10,-10)),((0,0),(10,-10)),
+               ((-7,-9),(-3,-20)),((-100,50),(-200,-25))];
+
+_ANGLES = [0,90,180,270,359,359.5,360,-90,45.5] + [_RNG.uniform(0,360) for i in range(500)];
+
+def test_distances():
+
+    pairs = _RANDOM_PAIRS + _EDGE_PAIRS + [((0,0),(0,10)),((0,0),(-10,0))];
+    points1 = numpy.array([a for a,b in pairs]);
+    points2 = numpy.array([b for a,b in pairs]);
+
+    expected = [geometry.distance(a,b) for a,b in pairs];
+
+    assert geometry.distances(points1,points2) == pytest.approx(expected,rel=1e-12,abs=1e-12);
+
+def test_distances_from_one_point():
+
+    points = numpy.array([b for a,b in _RANDOM_PAIRS]);
+
+    expected = [geometry.distance((-3,4),b) for b in points];
+
+    assert geometry.distances((-3,4),points) == pytest.approx(expected,rel=1e-12,abs=1e-12);
+
+@pytest.mark.parametrize('add',[0,90,180,270,-90,0.5])
+def test_turn_around_degrees_many(add):
+
+    expected = [geometry.turn_around_degrees(angle,add) for angle in _ANGLES];
+
+    assert geometry.turn_around_degrees_many(_ANGLES,add).tolist() == expected;
+
+def test_angles_to_locs():
+
+    starts = [a for a,b in _RANDOM_PAIRS[:len(_ANGLES)]];
+    lengths = [_RNG.uniform(0,500) for angle in _ANGLES];
+
+    expected = [geometry.angle_to_loc(start,angle,length) for start,angle,length in zip(starts,_ANGLES,lengths)];
+    result = geometry.angles_to_locs(numpy.array(starts),numpy.array(_ANGLES),numpy.array(lengths));
+
+    assert result == pytest.approx(numpy.array(expected),rel=1e-12,abs=1e-9);
+
+def test_angles_to_locs_from_one_point():
+
+    expected = [geometry.angle_to_loc((-1,-2),angle,7) for angle in _ANGLES];
+
+    assert geometry.angles_to_locs((-1,-2),numpy.array(_ANGLES),7) == pytest.approx(numpy.array(expected),abs=1e-9);
+
+def test_coords_to_angles():
+
+    pairs = _RANDOM_PAIRS + _EDGE_PAIRS;
+
+    expected = [geometry.coords_to_angle(a,b) for a,b in pairs];
+    result = geometry.coords_to_angles(numpy.array([a for a,b in pairs]),numpy.array([b for a,b in pairs]));
+
+    assert result == pytest.approx(expected,abs=1e-9);
+
+def test_coords_to_angles_straight_lines():
+
+    #0, 90, 180 and 270 degrees; coords_to_angle is off straight up, down and left, the array version isn't
+    starts = numpy.array([(0,0),(-4,-4),(5,-1),(0,0)]);
+    ends = numpy.array([(10,0),(-4,-14),(-5,-1),(0,3)]);
+
+    assert geometry.coords_to_angles(starts,ends).tolist() == [0,90,180,270];
+
+def test_coords_to_angles_stays_below_360():
+
+    angles = geometry.coords_to_angles((0,0),numpy.array([(1,1e-17),(1,-1e-17),(1,0)]));
+
+    assert ((angles >= 0) & (angles < 360)).all();
+
+def test_distances_to_coords_via_points():
+
+    pairs = _RANDOM_PAIRS + _EDGE_PAIRS;
+    lengths = [_RNG.uniform(0,300) for pair in pairs];
+
+    expected = [geometry.distance_to_coord_via_point(a,length,b) for (a,b),length in zip(pairs,lengths)];
+    result = geometry.distances_to_coords_via_points(numpy.array([a for a,b in pairs]),numpy.array(lengths),
+                                                     numpy.array([b for a,b in pairs]));
+
+    assert result == pytest.approx(numpy.array(expected),rel=1e-9,abs=1e-6);
+
+def test_distances_to_coords_via_points_straight_lines():
+
+    #Straight up, down and left, where the scalar version is off, and on top of each other (to the right)
+    starts = numpy.array([(0,0),(0,0),(0,0),(2,2)]);
+    vias = numpy.array([(0,-10),(0,10),(-10,0),(2,2)]);
+
+    result = geometry.distances_to_coords_via_points(starts,numpy.array([5,5,5,5]),vias);
+
+    assert result.tolist() == [[0,-15],[0,15],[-15,0],[7,2]];
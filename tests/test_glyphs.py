@@ -0,0 +1,76 @@
+import numpy
+import pygame as p
+from OpenGL.GL import *
+
+import glux
+
+def _render(window,draw):
+
+    window.change_rendermode('texture',width=window.width,height=window.height);
+    window.fill((0,0,0,1));
+    draw();
+    window.change_rendermode('window');
+
+    texture = window.render_texture;
+    texture.bind();
+    pixels = glGetTexImage(GL_TEXTURE_2D,0,GL_RGBA,GL_UNSIGNED_BYTE);
+    window.render_targets.release(texture);
+
+    return numpy.frombuffer(bytes(pixels),dtype=numpy.uint8).reshape(window.height,window.width,4);
+
+def test_new_glyphs_dont_move_batched_ones(clean_window):
+
+    window = clean_window;
+    font = p.font.Font(None,30);
+
+    #The second text adds characters to the atlas while the first one waits in the batch
+    def draw_batched():
+        window.begin_batch();
+        window.draw(glux.GlyphText('abcdef',font,(255,255,255)),(10,10));
+        window.draw(glux.GlyphText('WXYZ@#',font,(255,255,255)),(10,60));
+        window.end_batch();
+
+    #Every character is in the atlas already
+    def draw_directly():
+        window.draw(glux.GlyphText('abcdef',font,(255,255,255)),(10,10));
+        window.draw(glux.GlyphText('WXYZ@#',font,(255,255,255)),(10,60));
+
+    batched = _render(window,draw_batched);
+    reference = _render(window,draw_directly);
+
+    assert (reference[:,:,:3] > 0).sum() > 100;
+    assert numpy.array_equal(batched,reference);
+
+def test_update_keeps_built_regions_in_place(window):
+
+    font = p.font.Font(None,30);
+    atlas = glux.TextureAtlas(128);
+    old = [atlas.add_text(char,font,(255,255,255)) for char in 'abc'];
+    atlas.build();
+
+    uvs = [region.uv for region in old];
+    pages = list(atlas.pages);
+
+    new = [atlas.add_text(char,font,(255,255,255)) for char in 'WXYZ'];
+    atlas.update();
+
+    assert [region.uv for region in old] == uvs;
+    assert atlas.pages[:len(pages)] == pages;
+    assert all(region.page != None for region in new);
+
+def test_glyph_textblock_in_a_layer(clean_window):
+
+    window = clean_window;
+    font = p.font.Font(None,30);
+    textblock = glux.Textblock('Frozen glyphs look the same as drawn ones',font,(255,255,255),150,glyphs=True);
+
+    layer = glux.Layer(window);
+    layer.append(textblock,(20,30));
+    layer.freeze();
+
+    frozen = _render(window,lambda: window.draw(layer,(0,0)));
+    reference = _render(window,lambda: window.draw(textblock,(20,30)));
+
+    assert len(textblock.images) > 1;
+    assert (reference[:,:,:3] > 0).sum() > 100;
+    assert numpy.array_equal(frozen,reference);
@@ -0,0 +1,57 @@
+import random
+import numpy
+import pygame as p
+import pytest
+
+import glux
+
+def _caster():
+
+    surface = p.Surface((30,40),p.SRCALPHA);
+    surface.fill((200,50,50,255),(5,5,20,35));
+
+    return glux.Texture(surface);
+
+def _most_overlapping(window,lights):
+    """The largest number of light areas that cover the same pixel""";
+
+    count = numpy.zeros((window.height,window.width),dtype=int);
+
+    for light in lights:
+        x, y, width, height = light.area;
+        count[max(0,y):y+height,max(0,x):x+width] += 1;
+
+    return count.max();
+
+@pytest.mark.parametrize('shadows',[False,True])
+def test_one_light_is_within_one_step(clean_window,shadows):
+
+    window = clean_window;
+    window.set_shadowcasters([(_caster(),(100,100)),(_caster(),(180,60))]);
+    lights = [glux.Light((255,200,100,255),120,shadows)];
+
+    difference, pixels = glux.compare_lighting(window,lights,[(160,120)]);
+
+    assert difference <= glux.MAX_DIFFERENCE_PER_LIGHT;
+
+def test_many_lights_stay_within_the_bound(clean_window):
+
+    window = clean_window;
+    window.set_shadowcasters([(_caster(),(100,100)),(_caster(),(180,60)),(_caster(),(40,170))]);
+    window.set_env_color((30,20,10,255));
+
+    #More lights than fit in one pass
+    random.seed(1);
+    lights = [];
+    positions = [];
+
+    for i in range(45):
+        color = (random.randint(0,255),random.randint(0,255),random.randint(0,255),random.randint(100,255));
+        lights.append(glux.Light(color,random.randint(20,120),random.random() < 0.6));
+        positions.append((random.randint(0,320),random.randint(0,240)));
+
+    engine = glux.ShaderLighting();
+    difference, pixels = glux.compare_lighting(window,lights,positions,engine);
+
+    assert engine.passes == 2;
+    assert difference <= glux.MAX_DIFFERENCE_PER_LIGHT * _most_overlapping(window,lights);
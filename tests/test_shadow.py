@@ -0,0 +1,124 @@
+import numpy
+import pygame as p
+import pytest
+from OpenGL.GL import *
+
+import glux
+
+def _notched_caster(square_shadow=False):
+
+    #Notches in the silhouette show where the texture ends up in the shadow
+    surface = p.Surface((32,48),p.SRCALPHA);
+    surface.fill((120,80,40,255));
+
+    for y in range(0,48,8):
+        surface.fill((0,0,0,0),(0,y,10,4));
+        surface.fill((0,0,0,0),(22,y+4,10,4));
+
+    return glux.Texture(surface,base=(0,36,32,12),square_shadow=square_shadow);
+
+def _draw_shadow_immediate(texture,basepoint1,basepoint2,topleft,topright,dest,inside):
+    """Texture.draw_shadow as it was, in immediate mode, as the reference""";
+
+    glColor4fv((0,0,0,1) if inside else (0,0,0,0.6));
+    glLoadIdentity();
+    glTranslate(dest[0],dest[1],0);
+
+    if texture.square_shadow:
+        glBegin(GL_QUADS);
+        glVertex2f(*basepoint1);
+        glVertex2f(*topleft);
+        glVertex2f(*topright);
+        glVertex2f(*basepoint2);
+    else:
+        left, bottom, right, top = texture.uv;
+
+        texture.bind();
+        glBegin(GL_QUADS);
+        glTexCoord2f(left,bottom); glVertex2f(*basepoint1);
+
+        if not inside:
+            glColor4fv((0,0,0,0));
+
+        glTexCoord2f(left,top); glVertex2f(*topleft);
+        glTexCoord2f(right,top); glVertex2f(*topright);
+
+        if not inside:
+            glColor4fv((0,0,0,1));
+
+        glTexCoord2f(right,bottom); glVertex2f(*basepoint2);
+
+    glEnd();
+
+def _render_shadows(window,draw):
+
+    window.change_rendermode('texture',width=window.width,height=window.height);
+    window.fill((1,1,1,1));
+    draw();
+    window.change_rendermode('window');
+
+    texture = window.render_texture;
+    texture.bind();
+    pixels = glGetTexImage(GL_TEXTURE_2D,0,GL_RGBA,GL_UNSIGNED_BYTE);
+    window.render_targets.release(texture);
+
+    return numpy.frombuffer(bytes(pixels),dtype=numpy.uint8).reshape(window.height,window.width,4).astype(int);
+
+@pytest.mark.parametrize('inside',[True,False])
+@pytest.mark.parametrize('square_shadow',[False,True])
+def test_batched_shadows_match_immediate_mode(clean_window,monkeypatch,inside,square_shadow):
+
+    window = clean_window;
+    caster = _notched_caster(square_shadow);
+    light = glux.Light((255,255,255,255),200,True);
+    light_location = (40,20);
+
+    window.set_shadowcasters([(caster,(200,150)),(caster,(120,60))]);
+    window.inside = inside;
+
+    def draw_batched():
+        window.draw_shadows(light,light_location,[0,1]);
+
+    def draw_per_caster():
+        for source,dest in window.shadowcasters:
+            window.draw_shadow(light,light_location,source,dest);
+
+    batched = _render_shadows(window,draw_batched);
+    streamed = _render_shadows(window,draw_per_caster);
+
+    monkeypatch.setattr(glux.Texture,'draw_shadow',_draw_shadow_immediate);
+    reference = _render_shadows(window,draw_per_caster);
+
+    #There have to be shadows to compare
+    assert (reference[:,:,:3] < 255).sum() > 1000;
+
+    for result in [batched,streamed]:
+        difference = numpy.abs(result - reference);
+        assert difference.max() <= 1 and (difference > 0).sum() < 50;
+
+def test_max_longest_side_follows_adds_and_removes():
+
+    def caster(width,height):
+        return glux.SoftwareCaster(p.Surface((width,height),p.SRCALPHA));
+
+    batch = glux.shadow.ShadowBatch([(caster(10,20),(0,0)),(caster(40,5),(50,50))]);
+    assert batch.get_max_longest_side() == 40;
+
+    big = batch.append(caster(30,60),(10,10));
+    assert batch.get_max_longest_side() == 60;
+
+    batch.move(big,(100,100));
+    batch.remove(0);
+    assert batch.get_max_longest_side() == 60;
+
+    batch.remove(big);
+    assert batch.get_max_longest_side() == 40;
+
+    small = batch.append(caster(15,15),(0,0));
+    assert batch.get_max_longest_side() == 40;
+
+    batch.remove(1);
+    assert batch.get_max_longest_side() == 15;
+
+    batch.remove(small);
+    assert batch.get_max_longest_side() == 0;
@@ -0,0 +1,93 @@
+import numpy
+import pygame as p
+import pytest
+from OpenGL.GL import *
+
+import glux
+import glux.softlight
+
+def _caster(width=10,height=10):
+
+    surface = p.Surface((width,height),p.SRCALPHA);
+    surface.fill((255,0,0,255));
+
+    return glux.softlight.SoftwareCaster(surface);
+
+@pytest.mark.parametrize('position',[(105,5),(-20,5),(5,-20),(5,105), #Completely outside, past every edge
+                                     (95,5),(-5,5),(5,-5),(5,95),     #Sticking out of every edge
+                                     (-20,-20),(105,105)])
+def test_casters_outside_the_window(position):
+
+    lighting = glux.softlight.SoftwareLighting(100,100,[(_caster(),position)]);
+
+    x, y = position;
+    expected = numpy.zeros((100,100),dtype=bool);
+    expected[max(0,y):max(0,y+10),max(0,x):max(0,x+10)] = True;
+
+    #The mask has the bottom row first
+    assert (lighting.white_shadowcasters[::-1] == expected).all();
+
+def _casters_around(width,height,make_caster):
+    """Casters past every edge, and one sticking out of the bottom right corner""";
+
+    positions = [(width+5,5),(-20,height//2),(width//2,-20),(width//2,height+5),(width-5,height-5)];
+
+    return [(make_caster(),position) for position in positions];
+
+def test_lighting_with_casters_outside_the_window():
+
+    #Next to the casters around the window, one inside it whose shadow falls in the window too
+    casters = _casters_around(100,100,_caster) + [(_caster(),(20,70))];
+    light = glux.Light((255,255,255,255),80,True);
+
+    result = glux.softlight.SoftwareLighting(100,100,casters).build([light],[(50,50)]).astype(int);
+    unshadowed = glux.softlight.SoftwareLighting(100,100).build([light],[(50,50)]).astype(int);
+
+    #Right at the light it is the light's color; the pixel center is half a pixel away from it
+    assert (result[50,50] >= 250).all();
+
+    #The part of the corner caster in the window is lit like there are no shadows
+    assert (result[95:,95:] > 0).all();
+    assert (result[95:,95:] == unshadowed[95:,95:]).all();
+
+    #In the shadow it is darker than at the same distance from the light on the other side of it
+    shadowed = numpy.argwhere((unshadowed - result).max(axis=2) > 50);
+    assert len(shadowed) > 50;
+
+    for y,x in shadowed:
+        assert (result[y,x] < result[99-y,99-x]).all();
+        assert (result[99-y,99-x] == unshadowed[99-y,99-x]).all();
+
+def test_lighting_matches_opengl(clean_window):
+
+    window = clean_window;
+    width, height = window.width, window.height;
+
+    surface = p.Surface((10,10),p.SRCALPHA);
+    surface.fill((255,0,0,255));
+    texture = glux.Texture(surface);
+
+    window.set_shadowcasters(_casters_around(width,height,lambda: texture) + [(texture,(100,160))]);
+    lighting = glux.softlight.SoftwareLighting(width,height,_casters_around(width,height,_caster) +
+                                               [(_caster(),(100,160))]);
+
+    lights = [glux.Light((255,200,100,255),200,True),glux.Light((100,150,255,255),60,True)];
+    positions = [(width//2,height//2),(width+10,height+10)];
+
+    for light,position in zip(lights,positions):
+        light.render(position,window);
+
+    window.build_lighting(lights,[],key='software comparison');
+    lighting_texture = window.light['software comparison'];
+    lighting_texture.bind();
+    pixels = glGetTexImage(GL_TEXTURE_2D,0,GL_RGB,GL_UNSIGNED_BYTE);
+    window.light.release('software comparison');
+
+    #OpenGL has the bottom row first
+    expected = numpy.frombuffer(bytes(pixels),dtype=numpy.uint8).reshape(height,width,3)[::-1].astype(int);
+    result = lighting.build(lights,positions).astype(int);
+    unshadowed = glux.softlight.SoftwareLighting(width,height).build(lights,positions).astype(int);
+
+    #The caster in the window has to cast a shadow, or there is little to compare
+    assert ((unshadowed - result).max(axis=2) > 20).sum() > 50;
+    assert numpy.abs(result - expected).max() <= 1;
@@ -1,21 +1,50 @@
+import numpy
 import pygame as p
 from OpenGL.GL import *
 from OpenGL.GLU import *
 import glux.texture
+import glux.resources
+import glux.streaming
 import os
 
+#The two triangles glBegin(GL_QUADS) makes of a quad
+_QUAD_TRIANGLES = [0,1,3,1,2,3];
+
+#Alpha of the corners of a fading shadow: base, top, top, base
+_FADING_ALPHAS = numpy.array([0.6,0,0,1],dtype=numpy.float32);
+
 class Texture():
 
-    def __init__(self,source,colorkey=None,width=None,height=None,base=None,square_shadow=False,transparent=False):
+    #Point rotations turn around, relative to the bottom left corner
+    rotation_center = (56,56);
+
+    #Part of the OpenGL texture that holds the image, as left, bottom, right, top texture coordinates
+    uv = (0,0,1,1);
+
+    def __init__(self,source,colorkey=None,width=None,height=None,base=None,square_shadow=False,transparent=False,
+                 white_variant_from_surface=False):
+
+        cached_white_pixels = None;
+
+        #Take decoded pixels from the texture cache, if there is one
+        if isinstance(source,str) and _texture_cache != None:
+            current_surface, cached_width, cached_height, cached_white_pixels = _texture_cache.get(source,colorkey,transparent);
+            colorkey = None; #Already applied
+
+            if width == None:
+                width = cached_width;
+
+            if height == None:
+                height = cached_height;
 
         #Load the image via a pygame Surface
-        if isinstance(source,str):
+        elif isinstance(source,str):
             if not transparent:
                 current_surface = p.image.load(source).convert();
             else:
                 current_surface = p.image.load(source).convert_alpha();
 
-        elif isinstance(source,p.Surface) or isinstance(source,bytes):
+        elif isinstance(source,(p.Surface,bytes,memoryview)):
             current_surface = source;
         elif source == None:
             current_surface = None;
@@ -24,6 +53,7 @@ class Texture():
         self._alpha = 1;
         self.square_shadow = square_shadow
         self.white_variant = None;
+        self._white_pixels = cached_white_pixels;
 
         if width != None:
             self.width = width;
@@ -48,7 +78,11 @@ class Texture():
         #Transform to texture
         if colorkey != None:
             current_surface.set_colorkey(colorkey);
-        self._surface_to_texture(current_surface);
+        texturedata = self._surface_to_texture(current_surface);
+
+        #Derive the white mask from the pixels we already have, so no GPU readback is needed later
+        if white_variant_from_surface and self._white_pixels == None and isinstance(texturedata,(bytes,memoryview)):
+            self._white_pixels = rgba_to_white_mask(texturedata);
 
         #Transform to displaylist
         self.texture_to_displaylist();
@@ -61,9 +95,8 @@ class Texture():
     @alpha.setter
     def alpha(self,value):
 
-        if value != self._alpha:
-            self._alpha = value;
-            self.texture_to_displaylist();
+        #The color is set when drawing, so the displaylist can stay as it is
+        self._alpha = value;
 
     def get_center(self,loc):
 
@@ -74,13 +107,15 @@ class Texture():
         #Turn it into a string
         if surface == None:
             texturedata = 0;
-        elif isinstance(surface,bytes):
+        elif isinstance(surface,(bytes,memoryview)):
             texturedata = surface;
         else:
             texturedata = p.image.tostring(surface, "RGBA", 1);
 
-        #Create an OpenGL texture
-        self.tex = glGenTextures(1); #create
+        #Create an OpenGL texture, deleted after this object is
+        self.delete();
+        self.tex = glux.resources.manager.track('texture',glGenTextures(1),self,
+                                                '%s %dx%d' % (self.__class__.__name__,self.width,self.height));
         self.bind();
 
         #Some settings
@@ -94,17 +129,19 @@ class Texture():
         else:
             glTexImage2D( GL_TEXTURE_2D, 0, GL_RGB, self.width, self.height, 0, GL_RGB, GL_UNSIGNED_BYTE, None )
 
+        return texturedata;
+
     def texture_to_displaylist(self):
 
-        #Create displaylist
-        self.list = glGenLists(1);
+        #Create displaylist, instead of the previous one
+        if getattr(self,'list',None) != None:
+            glux.resources.manager.release('display_list',self.list);
+
+        self.list = glux.resources.manager.track('display_list',glGenLists(1),self);
 
         #Bind the displaylist
         glNewList(self.list,GL_COMPILE);
 
-        #Reset the color
-        glColor4fv((1,1,1,self._alpha));
-
         #Put the texture on a qaudrangle
         self.bind();
 
@@ -115,10 +152,12 @@ class Texture():
 
         glBegin(GL_QUADS);
 
-        glTexCoord2f(0, 0); glVertex2f(0, 0);    # Bottom Left Of The Texture and Quad
-        glTexCoord2f(0, 1); glVertex2f(0, self.height);    # Top Left Of The Texture and Quad
-        glTexCoord2f(1, 1); glVertex2f(self.width, self.height);    # Top Right Of The Texture and Quad
-        glTexCoord2f(1, 0); glVertex2f(self.width, 0);    # Bottom Right Of The Texture and Quad
+        left, bottom, right, top = self.uv;
+
+        glTexCoord2f(left, bottom); glVertex2f(0, 0);    # Bottom Left Of The Texture and Quad
+        glTexCoord2f(left, top); glVertex2f(0, self.height);    # Top Left Of The Texture and Quad
+        glTexCoord2f(right, top); glVertex2f(self.width, self.height);    # Top Right Of The Texture and Quad
+        glTexCoord2f(right, bottom); glVertex2f(self.width, 0);    # Bottom Right Of The Texture and Quad
 
         #Finish
         glEnd();
@@ -133,7 +172,10 @@ class Texture():
 
         glBindTexture(GL_TEXTURE_2D, 0);
 
-    def draw(self,dest,rotation=None):
+    def draw(self,dest,rotation=None,alpha=None):
+
+        if alpha == None:
+            alpha = self._alpha;
 
         #Reset the position
         glLoadIdentity();
@@ -142,12 +184,14 @@ class Texture():
         glTranslate(dest[0],dest[1],0);
 
         if rotation != None:
-            centerx = 56;
-            centery = 56;
+            centerx, centery = self.rotation_center;
             glTranslatef(centerx,centery,0);
             glRotate(rotation,0,0,-1);
             glTranslatef(-centerx,-centery,0);
 
+        #Reset the color
+        glColor4fv((1,1,1,alpha));
+
         #Draw the displaylist
         glCallList(self.list);
 
@@ -167,11 +211,16 @@ class Texture():
 
     def draw_shadow(self,basepoint1,basepoint2,topleft,topright,dest,inside):
 
-        #Reset the color
+        #The quadrangle as two triangles, and how dark each corner is
+        corners = numpy.array([basepoint1,topleft,topright,basepoint2],dtype=numpy.float32)[_QUAD_TRIANGLES];
+        colors = numpy.zeros((6,4),dtype=numpy.float32);
+
         if inside:
-            glColor4fv((0,0,0,1));
+            colors[:,3] = 1;
+        elif self.square_shadow:
+            colors[:,3] = 0.6;
         else:
-            glColor4fv((0,0,0,0.6));
+            colors[:,3] = _FADING_ALPHAS[_QUAD_TRIANGLES]; #Make shadow fade away
 
         #Reset the position
         glLoadIdentity();
@@ -179,57 +228,43 @@ class Texture():
         #Travel to the coordinate
         glTranslate(dest[0],dest[1],0);
 
+        glEnableClientState(GL_VERTEX_ARRAY);
+        glEnableClientState(GL_COLOR_ARRAY);
+
+        stream = glux.streaming.get_stream_buffer();
+
         #Put the texture on a qaudrangle
         if self.square_shadow:
-            glBegin(GL_QUADS);
-            glVertex2f(*basepoint1);
-            glVertex2f(*topleft);
-            glVertex2f(*topright);
-            glVertex2f(*basepoint2);
+            vertex_offset, color_offset = stream.write(corners,colors);
         else:
-            self.bind();
-            glBegin(GL_QUADS);
-            glTexCoord2f(0, 0); glVertex2f(*basepoint1);    # Bottom Left Of The Texture and Quad
-
-            if not inside:
-                glColor4fv((0,0,0,0)); #Make shadow fade away
+            left, bottom, right, top = self.uv;
+            texcoords = numpy.array([[left,bottom],[left,top],[right,top],[right,bottom]],dtype=numpy.float32);
 
-            glTexCoord2f(0, 1); glVertex2f(*topleft);    # Top Left Of The Texture and Quad
-            glTexCoord2f(1, 1); glVertex2f(*topright);    # Top Right Of The Texture and Quad
+            vertex_offset, color_offset, texcoord_offset = stream.write(corners,colors,texcoords[_QUAD_TRIANGLES]);
 
-            if not inside:
-                glColor4fv((0,0,0,1));
+            self.bind();
+            glEnableClientState(GL_TEXTURE_COORD_ARRAY);
+            glTexCoordPointer(2,GL_FLOAT,0,texcoord_offset);
 
-            glTexCoord2f(1, 0); glVertex2f(*basepoint2);    # Bottom Right Of The Texture and Quad
+        glVertexPointer(2,GL_FLOAT,0,vertex_offset);
+        glColorPointer(4,GL_FLOAT,0,color_offset);
+        glDrawArrays(GL_TRIANGLES,0,6);
 
-        glEnd();
+        stream.unbind();
+        glDisableClientState(GL_TEXTURE_COORD_ARRAY);
+        glDisableClientState(GL_COLOR_ARRAY);
+        glDisableClientState(GL_VERTEX_ARRAY);
 
     def give_white_variant(self):
 
         if self.white_variant == None:
-            self.bind();
-            colored_pixels = glGetTexImage(GL_TEXTURE_2D, 0, GL_RGBA, GL_UNSIGNED_BYTE);
-            white_pixels = b'';
-
-            white_pixel = b'\xff\xff\xff\xff';
-            transparent_pixel = b'\x00\x00\x00\x00';
-
-            nr = 0;
-
-            for b in colored_pixels:
-
-                if nr == 3:
-
-                    if b == 0:
-                        white_pixels += transparent_pixel;
-                    else:
-                        white_pixels += white_pixel;
 
-                nr += 1;
-                if nr > 3:
-                    nr = 0;
+            if self._white_pixels == None:
+                self.bind();
+                colored_pixels = glGetTexImage(GL_TEXTURE_2D, 0, GL_RGBA, GL_UNSIGNED_BYTE);
+                self._white_pixels = rgba_to_white_mask(colored_pixels);
 
-            self.white_variant = Texture(white_pixels,width=self.width,height=self.height,
+            self.white_variant = Texture(self._white_pixels,width=self.width,height=self.height,
                                          base=self.base,square_shadow=self.square_shadow);
 
         return self.white_variant;
@@ -238,69 +273,97 @@ class Texture():
 
         return p.Rect(0,0,self.width,self.height)
 
-    def __del__(self):
-        glDeleteTextures(self.tex);
+    def delete(self):
+        """Frees the texture and displaylist at the end of the frame, instead of when this object is collected""";
+
+        if getattr(self,'tex',None) != None:
+            glux.resources.manager.release('texture',self.tex);
+            self.tex = None;
+
+        if getattr(self,'list',None) != None:
+            glux.resources.manager.release('display_list',self.list);
+            self.list = None;
 
 class Animation():
 
-    def __init__(self,name,speed,path=None,colorkey=None):
+    def __init__(self,name,speed,path=None,colorkey=None,atlas=None,frames=None):
 
-        """Speed can go from 0 to 100"""
+        """Speed can go from 0 to 100, fractions allowed: each frame is shown for 101-speed ticks.
+        With an atlas, the frames are packed into it (build it before drawing).
+        Frames can be given directly instead of a name, to share them with other animations"""
 
         self._alpha = 1;
-        self.unique_frames = [];
-        self.frames = [];
+        self.speed = speed;
 
-        if path == None:
-            files = os.listdir();
-        else:
-            files = os.listdir(path);
+        if frames == None:
+            frames = [];
 
-        files.sort();
-
-        for f in files:
-            if name in f:
-                if path==None:
-                    file_loc = f;
+            for file_loc in find_animation_files(name,path):
+                if atlas == None:
+                    frames.append(Texture(file_loc,colorkey=colorkey));
                 else:
-                    file_loc = path+'/'+f;
-                self.unique_frames.append(Texture(file_loc,colorkey=colorkey));
-
-        for uf in self.unique_frames:
-            for i in range(101-speed):
-                self.frames.append(uf);
+                    frames.append(atlas.add(file_loc,colorkey=colorkey,transparent=False));
 
-        self.current_frame = 0;
+        #Every frame is stored once; which one to show follows from the number of ticks passed
+        self.frames = frames;
+        self.unique_frames = frames;
+        self.position = 0;
         self.paused = False;
 
         self.height = self.frames[0].height;
         self.width = self.frames[0].width;
 
+    @classmethod
+    def from_frames(cls,frames,speed):
+
+        return cls(None,speed,frames=frames);
+
+    def copy(self):
+        """A new animation with its own position, pause state and alpha, sharing the frame textures""";
+
+        return Animation.from_frames(self.frames,self.speed);
+
+    @property
+    def ticks_per_frame(self):
+
+        return 101 - self.speed;
+
+    @property
+    def current_frame(self):
+
+        return int(self.position // self.ticks_per_frame) % len(self.frames);
+
+    @current_frame.setter
+    def current_frame(self,value):
+
+        self.position = value * self.ticks_per_frame;
+
     def get_rect(self):
 
         return p.Rect(0,0,self.width,self.height)
 
-    def tick(self):
+    def tick(self,ticks=1):
 
         """Changes which frame is the current frame, returns whether this is another image""";
 
-        old = self.frames[self.current_frame];
+        if self.paused:
+            return False;
 
-        if not self.paused:
-            self.current_frame += 1;
+        old = self.current_frame;
 
-            if self.current_frame + 1 > len(self.frames):
-                self.current_frame = 0;
+        #Wrap around, so the position stays small
+        self.position = (self.position + ticks) % (self.ticks_per_frame * len(self.frames));
 
-        new = self.frames[self.current_frame];
+        return old != self.current_frame;
 
-        if old == new:
-            return False;
-        else:
-            return True;
+    def update(self,milliseconds,ticks_per_second=60):
+
+        """Moves on by elapsed time instead of by frames drawn""";
+
+        return self.tick(milliseconds * ticks_per_second / 1000);
 
     def draw(self,dest,rotation=None):
-        self.frames[self.current_frame].draw(dest);
+        self.frames[self.current_frame].draw(dest,rotation,self._alpha);
 
     def pause(self):
         self.paused = True;
@@ -316,23 +379,25 @@ class Animation():
     @alpha.setter
     def alpha(self,value):
 
-        for frame in self.frames:
-            frame.alpha = value;
-
+        #Used when drawing, so frames shared with other animations are left alone
         self._alpha = value;
 
 class Layer():
 
-    def __init__(self,window):
+    def __init__(self,window,tile_size=None):
+
+        """With a tile_size, the contents are split up in square tiles of that many pixels, each with
+        its own displaylist: changes only rebuild their tiles, and tiles off screen are not drawn""";
 
         self.window = window;
         self.width = 0;
         self.height = 0;
+        self.tile_size = tile_size;
 
         #Save the textures
         self.textures = [];
+        self.tiles = {};
 
-        self.glist = None;
         self.frozen = False;
         self.pointer_pos = (0,0);
 
@@ -343,6 +408,39 @@ class Layer():
 
         for i in material:
             self.textures.append(i);
+            self._get_tile(i[1]).add(i);
+
+    def remove(self,material,location):
+
+        self.textures.remove((material,location));
+        self._get_tile(location).remove((material,location));
+
+    def move(self,material,old_location,new_location):
+
+        self.remove(material,old_location);
+        self.append(material,new_location);
+
+    def _get_tile(self,location):
+
+        if self.tile_size == None:
+            key = (0,0);
+        else:
+            key = (int(location[0] // self.tile_size),int(location[1] // self.tile_size));
+
+        if key not in self.tiles:
+            self.tiles[key] = _Tile();
+
+        return self.tiles[key];
+
+    def _add_item_to_displaylist(self,texture,dest):
+
+        #A GlyphText has no texture of its own: every glyph is a quad with its place in the glyph atlas,
+        #standing on the bottom of the text like when it's drawn
+        if isinstance(texture,glux.glyphs.GlyphText):
+            for region,x in texture.glyphs:
+                self._add_tex_to_displaylist(region,(dest[0] + x,dest[1] + texture.height - region.height));
+        else:
+            self._add_tex_to_displaylist(texture,dest);
 
     def _add_tex_to_displaylist(self,texture,dest):
 
@@ -358,36 +456,53 @@ class Layer():
         self.pointer_pos = dest;
 
         glBegin(GL_QUADS);
-        glTexCoord2f(0, 0); glVertex2f(0, 0);    # Bottom Left Of The Texture and Quad
-        glTexCoord2f(0, 1); glVertex2f(0, texture.height);    # Top Left Of The Texture and Quad
-        glTexCoord2f(1, 1); glVertex2f(texture.width, texture.height);    # Top Right Of The Texture and Quad
-        glTexCoord2f(1, 0); glVertex2f(texture.width, 0);    # Bottom Right Of The Texture and Quad
+        left, bottom, right, top = texture.uv;
+
+        glTexCoord2f(left, bottom); glVertex2f(0, 0);    # Bottom Left Of The Texture and Quad
+        glTexCoord2f(left, top); glVertex2f(0, texture.height);    # Top Left Of The Texture and Quad
+        glTexCoord2f(right, top); glVertex2f(texture.width, texture.height);    # Top Right Of The Texture and Quad
+        glTexCoord2f(right, bottom); glVertex2f(texture.width, 0);    # Bottom Right Of The Texture and Quad
 
         #Finish
         glEnd();
 
     def freeze(self):
 
+        """(Re)builds the displaylists of the tiles that changed""";
+
+        for key in list(self.tiles.keys()):
+            tile = self.tiles[key];
+
+            if not tile.dirty:
+                continue;
+
+            if tile.glist != None:
+                glux.resources.manager.release('display_list',tile.glist);
+                tile.glist = None;
+
+            if len(tile.items) == 0:
+                del self.tiles[key];
+                continue;
+
+            self._freeze_tile(tile);
+
+        self.frozen = True;
+
+    def _freeze_tile(self,tile):
+
         glLoadIdentity();
         self.pointer_pos = (0,0);
 
-        displaylist_created = False;
-
-        while not displaylist_created:
-            try:
-                #Create displaylist
-                self.glist = glGenLists(1);
+        #Create displaylist
+        tile.glist = glux.resources.manager.track('display_list',glGenLists(1),tile,'Layer tile');
 
-                #Bind the displaylist
-                glNewList(self.glist,GL_COMPILE);
-                displaylist_created = True;
-            except:
-                print('Warning: OpenGL displaylist creation error')
+        #Bind the displaylist
+        glNewList(tile.glist,GL_COMPILE);
 
-        for texture, dest in self.textures:
+        for texture, dest in tile.items:
 
             if not isinstance(texture,Textblock):
-                self._add_tex_to_displaylist(texture, dest);
+                self._add_item_to_displaylist(texture, dest);
 
                 #See if you need to be bigger
                 if texture.height > self.height:
@@ -403,7 +518,7 @@ class Layer():
                     if texture.center:
                         x = round(original_x + (texture.width - i.width) / 2);
 
-                    self._add_tex_to_displaylist(i,(x,y));
+                    self._add_item_to_displaylist(i,(x,y));
 
                     #See if you need to be bigger
                     if i.height > self.height:
@@ -416,7 +531,8 @@ class Layer():
 
         glEndList();
 
-        self.frozen = True;
+        tile.update_bounds();
+        tile.dirty = False;
 
     def draw(self,dest,rotation=None):
 
@@ -424,14 +540,75 @@ class Layer():
             #Reset the color
             glColor4fv((1,1,1,1));
 
-            #Reset the position
-            glLoadIdentity();
+            #The part of the window being drawn, moved to the layer's own pygame coordinates
+            view_x, view_y, view_width, view_height = self.window.view;
+            view_x -= dest[0];
+            view_y += dest[1];
+
+            camera = self.window.camera;
+
+            for tile in self.tiles.values():
+
+                if tile.glist == None:
+                    continue;
+
+                #Skip tiles that are completely outside the view
+                left, top, right, bottom = tile.bounds;
+
+                if right < view_x or left > view_x + view_width or bottom < view_y or top > view_y + view_height:
+                    if camera != None:
+                        camera.culled += 1;
+                    continue;
+
+                if camera != None:
+                    camera.drawn += 1;
+
+                #Reset the position
+                glLoadIdentity();
+
+                #Travel to the coordinate
+                glTranslate(dest[0],dest[1],0);
+
+                #Draw the displaylist
+                glCallList(tile.glist);
+
+class _Tile():
+
+    def __init__(self):
+
+        self.items = [];
+        self.glist = None;
+        self.dirty = True;
+        self.bounds = (0,0,0,0); #left, top, right, bottom in pygame coordinates
+
+    def add(self,item):
+
+        self.items.append(item);
+        self.dirty = True;
+
+    def remove(self,item):
+
+        self.items.remove(item);
+        self.dirty = True;
+
+    def update_bounds(self):
+
+        left = top = float('inf');
+        right = bottom = float('-inf');
 
-            #Travel to the coordinate
-            glTranslate(dest[0],dest[1],0);
+        for texture, dest in self.items:
 
-            #Draw the displaylist
-            glCallList(self.glist);
+            if isinstance(texture,Textblock):
+                height = texture.height * len(texture.images);
+            else:
+                height = texture.height;
+
+            left = min(left,dest[0]);
+            top = min(top,dest[1]);
+            right = max(right,dest[0] + texture.width);
+            bottom = max(bottom,dest[1] + height);
+
+        self.bounds = (left,top,right,bottom);
 
 class Text(Texture):
 
@@ -454,7 +631,8 @@ class Text(Texture):
 
 class Textblock(Texture):
 
-    def __init__(self,text,font,color,width,center=False):
+    def __init__(self,text,font,color,width,center=False,glyphs=False):
+        """With glyphs True, the lines are GlyphTexts instead of Texts""";
 
         self._alpha = 1;
         self.font = font;
@@ -462,6 +640,7 @@ class Textblock(Texture):
         self.color = color;
         self.text = text;
         self.center = center;
+        self.glyphs = glyphs;
 
         #Will be calculated later
         self.lines = [''];
@@ -479,7 +658,8 @@ class Textblock(Texture):
 
         for w in words:
 
-            #How long will the line be with this word added?
+            #How long will the line be with this word added? Measured as one string, as kerning and
+            #overhang make that different from adding up the widths of the words
             if self.lines[current_line] == '':
                 trying_out_text = w;
             else:
@@ -494,13 +674,25 @@ class Textblock(Texture):
                 self.lines.append(w);
                 current_line += 1;
 
-    def _lines_to_images(self):
+    def _lines_to_images(self,old_images=None):
 
         self.height = 0;
         self.images = [];
 
+        if old_images == None:
+            old_images = {};
+
         for l in self.lines:
-            t = Text(l,self.font,self.color);
+
+            #Lines that didn't change keep their image
+            if l in old_images:
+                t = old_images.pop(l);
+            elif self.glyphs:
+                t = glux.glyphs.GlyphText(l,self.font,self.color);
+            else:
+                t = Text(l,self.font,self.color);
+
+            t.alpha = self._alpha;
             self.images.append(t);
 
             #Get the highest line height
@@ -508,12 +700,20 @@ class Textblock(Texture):
                 self.height = t.height;
 
     def change_text(self,newtext):
-        """Freeze text into image again""";
+        """Freeze text into image again; only lines that changed are rendered again""";
+
+        if newtext == self.text:
+            return;
+
+        old_images = {};
+
+        for l,image in zip(self.lines,self.images):
+            old_images[l] = image;
 
         self.text = newtext;
 
         self._text_to_lines();
-        self._lines_to_images();
+        self._lines_to_images(old_images);
 
     @property
     def alpha(self):
@@ -540,10 +740,75 @@ class Textblock(Texture):
             i.draw((x,y));
             y -= self.height;
 
-    def __del__(self):
+#Maps every alpha value to 0 (transparent) or 255 (anything visible)
+_ALPHA_TO_MASK = bytes([0]) + bytes([255]) * 255;
 
-        for i in self.images:
-            del i;
+def rgba_to_white_mask(pixels):
+    """Turns RGBA pixel data into white pixels wherever alpha isn't 0, in linear time""";
+
+    #Works for bytes as well as for arrays PyOpenGL might return
+    pixels = bytes(pixels);
+
+    mask = pixels[3::4].translate(_ALPHA_TO_MASK);
+
+    white_pixels = bytearray(len(mask) * 4);
+    for channel in range(4):
+        white_pixels[channel::4] = mask;
+
+    return bytes(white_pixels);
+
+def decode_image(filename,colorkey=None,transparent=False):
+    """Loads an image file into flipped RGBA bytes, like Texture does, without needing a display""";
+
+    surface = p.image.load(filename);
+
+    #Without a display there is no convert(); dropping the alpha channel gives the same pixels
+    if not transparent and surface.get_flags() & p.SRCALPHA:
+        surface = p.image.fromstring(p.image.tostring(surface,'RGB'),surface.get_size(),'RGB');
+
+    if colorkey != None:
+        surface.set_colorkey(colorkey);
+
+    return p.image.tostring(surface,'RGBA',1), surface.get_width(), surface.get_height();
+
+#Set with set_texture_cache
+_texture_cache = None;
+
+def set_texture_cache(cache):
+    """Makes Texture and Animation load image files through a glux.TextureCache; None turns it off""";
+
+    global _texture_cache;
+    _texture_cache = cache;
+
+def load_image_data(filename,colorkey=None,transparent=False):
+    """Pixels, width, height and (if known) white pixels of an image file, from the texture cache if there is one""";
+
+    if _texture_cache != None:
+        return _texture_cache.get(filename,colorkey,transparent);
+
+    pixels, width, height = decode_image(filename,colorkey,transparent);
+
+    return pixels, width, height, None;
+
+def find_animation_files(name,path=None):
+    """The files of an animation: all files in path with name in their filename, sorted""";
+
+    if path == None:
+        files = os.listdir();
+    else:
+        files = os.listdir(path);
+
+    files.sort();
+    found = [];
+
+    for f in files:
+        if name in f:
+            if path==None:
+                found.append(f);
+            else:
+                found.append(path+'/'+f);
+
+    return found;
 
 def create_transparent_texture(width,height):
 
@@ -555,7 +820,7 @@ def create_transparent_texture(width,height):
 
 def is_texturelike(o):
 
-    if o.__class__ in [Texture,Text,glux.light.Glower,Animation,Textblock]:
+    if o.__class__ in [Texture,Text,glux.light.Glower,Animation,Textblock,glux.atlas.AtlasRegion,glux.glyphs.GlyphText]:
         return True;
     else:
         return False;